@@ -1,11 +1,20 @@
 from flask import Flask, jsonify, request
 from flask_migrate import Migrate
 from models import db, TokenBlocklist
+from blocklist import revoked_tokens
+from querystats import query_stats
+from loan_totals import recompute_loan_totals, check_loan_totals
+from unread_counts import recompute_unread_counts, check_unread_counts
+from idempotency import prune_expired_keys
+from notification_stream import notification_hub
+from notification_service import notification_dispatcher
+from notification_retention import archive_read_notifications
 from datetime import datetime
 from datetime import timedelta
 from flask_jwt_extended import JWTManager
 from flask_jwt_extended import create_access_token
 from flask_cors import CORS
+import click
 
 
 app = Flask(__name__)
@@ -17,16 +26,58 @@ app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///sacco.sqlite'
 migrate = Migrate(app, db)
 db.init_app(app)
 
+# per-endpoint SQL counts at /admin/metrics/queries; X-Query-* headers in debug
+app.config["QUERY_STATS_SLOW_MS"] = 100
+query_stats.init_app(app)
+
+# statement parsing: >1 splits transaction extraction across a process pool
+app.config["EXTRACTION_WORKERS"] = 1
+# background threads serving POST /upload?async=true
+app.config["UPLOAD_JOB_WORKERS"] = 2
+# queued/running jobs older than this were lost with their worker (restart) and are recovered
+app.config["UPLOAD_JOB_TIMEOUT"] = timedelta(minutes=10)
+
 
 # jwt
 app.config["JWT_SECRET_KEY"] = "asdddtfyggjj"
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] =  timedelta(hours=1)
+# embed is_admin/is_analyst in access tokens; role changes apply at next login
+app.config["JWT_ROLE_CLAIMS"] = True
+
+# responses kept for Idempotency-Key retries on money-moving endpoints
+app.config["IDEMPOTENCY_KEY_TTL"] = timedelta(hours=24)
+# a key whose request committed nothing and is older than this may be taken over by a retry
+app.config["IDEMPOTENCY_CLAIM_TIMEOUT"] = timedelta(minutes=1)
+
+# revoked-token cache: poll for other workers' logouts / prune expired rows
+app.config["JWT_BLOCKLIST_SYNC_SECONDS"] = 5
+app.config["JWT_BLOCKLIST_PRUNE_SECONDS"] = 3600
+
+# GET /notifications/stream: "memory" (one process) or "sqlite" relay shared by workers on a host
+app.config["NOTIFICATION_STREAM_BACKEND"] = "memory"
+app.config["NOTIFICATION_STREAM_KEEPALIVE_SECONDS"] = 15
+notification_hub.init_app(app)
+
+# background writer for queued notifications (notification_outbox)
+app.config["NOTIFICATION_DISPATCH_WORKER"] = True
+app.config["NOTIFICATION_DISPATCH_BATCH_SIZE"] = 100
+app.config["NOTIFICATION_DISPATCH_INTERVAL_SECONDS"] = 5
+app.config["NOTIFICATION_DISPATCH_MAX_ATTEMPTS"] = 5
+notification_dispatcher.init_app(app)
+
+# archive-notifications: read notifications older than this leave the hot table, in chunks
+app.config["NOTIFICATION_RETENTION_DAYS"] = 90
+app.config["NOTIFICATION_ARCHIVE_BATCH_SIZE"] = 500
+app.config["NOTIFICATION_ARCHIVE_PAUSE_SECONDS"] = 0.05
 
 jwt = JWTManager(app)
 jwt.init_app(app)
+revoked_tokens.init_app(app)
 
 # imports functions from views
 from views import *
+from views.loan import LOAN_STATUS_NOTIFICATION_TYPES
+from views.upload import recover_upload_jobs
 
 app.register_blueprint(loan_bp)
 app.register_blueprint(transaction_bp)
@@ -40,6 +91,7 @@ app.register_blueprint(upload_bp)
 app.register_blueprint(extract_bp)
 app.register_blueprint(summary_bp)
 app.register_blueprint(interest_bp)
+app.register_blueprint(statement_bp)
 
 
 
@@ -47,10 +99,88 @@ app.register_blueprint(interest_bp)
 
 @jwt.token_in_blocklist_loader
 def check_if_token_revoked(jwt_header, jwt_payload: dict) -> bool:
-    jti = jwt_payload["jti"]
-    token = db.session.query(TokenBlocklist.id).filter_by(jti=jti).scalar()
-
-    return token is not None
+    return revoked_tokens.is_revoked(jwt_payload["jti"])
+
+
+@app.cli.command("prune-blocklist")
+def prune_blocklist():
+    """Delete revoked tokens that have expired anyway."""
+    print(f"Pruned {revoked_tokens.prune()} expired blocklist entries")
+
+
+@app.cli.command("prune-idempotency-keys")
+def prune_idempotency_keys():
+    """Delete stored Idempotency-Key responses past their TTL."""
+    print(f"Pruned {prune_expired_keys()} expired idempotency keys")
+
+
+@app.cli.command("recompute-loan-totals")
+def recompute_loan_totals_command():
+    """Rebuild each loan's stored repayment totals from its repayments."""
+    print(f"Updated repayment totals on {recompute_loan_totals()} loans")
+
+
+@app.cli.command("check-loan-totals")
+def check_loan_totals_command():
+    """List loans whose stored repayment totals have drifted."""
+    mismatches = check_loan_totals()
+    for m in mismatches:
+        print(f"Loan #{m['loan_id']}: stored {m['stored']} expected {m['expected']}")
+    print(f"{len(mismatches)} loans with inconsistent repayment totals")
+    if mismatches:
+        raise SystemExit(1)
+
+
+@app.cli.command("recover-upload-jobs")
+def recover_upload_jobs_command():
+    """Requeue or fail upload jobs left behind by a restarted worker."""
+    requeued, failed = recover_upload_jobs()
+    print(f"Requeued {requeued} upload jobs, marked {failed} failed")
+
+
+@app.cli.command("dispatch-notifications")
+def dispatch_notifications_command():
+    """Write every due queued notification now, without the background worker."""
+    written, failed = notification_dispatcher.drain()
+    print(f"Dispatched {written} queued notifications, {failed} failed")
+
+
+@app.cli.command("archive-notifications")
+@click.option("--days", type=int, help="Retention in days (default NOTIFICATION_RETENTION_DAYS).")
+@click.option("--batch-size", type=int, help="Rows per chunk (default NOTIFICATION_ARCHIVE_BATCH_SIZE).")
+@click.option("--pause", type=float, help="Seconds between chunks (default NOTIFICATION_ARCHIVE_PAUSE_SECONDS).")
+def archive_notifications_command(days, batch_size, pause):
+    """Move old read notifications into the compressed notification_archive table."""
+    def report(moved, seconds):
+        print(f"  {moved} rows moved, {moved / seconds if seconds else 0:.0f} rows/s")
+
+    moved, chunks, seconds = archive_read_notifications(
+        days if days is not None else app.config["NOTIFICATION_RETENTION_DAYS"],
+        batch_size=batch_size or app.config["NOTIFICATION_ARCHIVE_BATCH_SIZE"],
+        # status notifications are shown in loan history
+        keep_types=LOAN_STATUS_NOTIFICATION_TYPES,
+        pause=pause if pause is not None else app.config["NOTIFICATION_ARCHIVE_PAUSE_SECONDS"],
+        on_chunk=report
+    )
+    print(f"Archived {moved} notifications in {chunks} chunks, {seconds:.1f}s "
+          f"({moved / seconds if seconds else 0:.0f} rows/s)")
+
+
+@app.cli.command("recompute-unread-counts")
+def recompute_unread_counts_command():
+    """Reset each member's unread notification counter from the notification rows."""
+    print(f"Updated unread counters on {recompute_unread_counts()} members")
+
+
+@app.cli.command("check-unread-counts")
+def check_unread_counts_command():
+    """List members whose unread notification counter has drifted."""
+    mismatches = check_unread_counts()
+    for m in mismatches:
+        print(f"Member #{m['member_id']}: stored {m['stored']} expected {m['expected']}")
+    print(f"{len(mismatches)} members with inconsistent unread counters")
+    if mismatches:
+        raise SystemExit(1)
 
 
 
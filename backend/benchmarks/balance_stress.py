@@ -0,0 +1,194 @@
+"""Hammer one account with concurrent deposits and withdrawals.
+
+Every thread posts to /transaction with its own client. Afterwards the
+stored balance must equal the opening balance plus the transaction
+ledger, and must never have gone negative. Then every thread approves
+the same pending loan at once: exactly one approval may succeed and the
+loan must be disbursed once.
+
+    cd backend && python -m benchmarks.balance_stress --threads 16 --requests 200
+    cd backend && python -m benchmarks.balance_stress --database-url postgresql://...
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+
+def build_app(database_url):
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+    from werkzeug.security import generate_password_hash
+    from models import db, Member, Account
+    from views.transaction import transaction_bp
+    from views.admin import admin_bp
+
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=database_url,
+        # Writers queue on SQLite's file lock instead of failing immediately
+        SQLALCHEMY_ENGINE_OPTIONS={"connect_args": {"timeout": 30}} if database_url.startswith("sqlite") else {},
+        JWT_SECRET_KEY="sacco-balance-stress-secret-key",
+        JWT_VERIFY_SUB=False,
+    )
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(transaction_bp)
+    app.register_blueprint(admin_bp)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        member = Member(first_name="Stress", last_name="Test", username="stress",
+                        email="stress@example.com", password="x")
+        db.session.add(member)
+        db.session.flush()
+        # Cheap PIN hash so the database, not PIN checks, is the contended part
+        account = Account(member_id=member.id, balance=Decimal("0.00"),
+                          pin=generate_password_hash("1234", method="pbkdf2:sha256:1000"))
+        db.session.add(account)
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=member.id)}"}
+        account_id = account.id
+
+    return app, headers, account_id
+
+
+def setup_loan_race(app, amount):
+    """An admin token, plus a borrower account with one pending loan of ``amount``."""
+    from flask_jwt_extended import create_access_token
+    from models import db, Member, Account, Loan
+
+    with app.app_context():
+        admin = Member(first_name="Stress", last_name="Admin", username="stress-admin",
+                       email="stress-admin@example.com", password="x", is_admin=True)
+        borrower = Member(first_name="Stress", last_name="Borrower", username="stress-borrower",
+                          email="stress-borrower@example.com", password="x")
+        db.session.add_all([admin, borrower])
+        db.session.flush()
+        account = Account(member_id=borrower.id, balance=Decimal("0.00"), pin="x")
+        loan = Loan(member_id=borrower.id, amount=Decimal(str(amount)), purpose="Stress")
+        db.session.add_all([account, loan])
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=admin.id, additional_claims={'is_admin': True})}"}
+        return headers, account.id, loan.id
+
+
+def approve_race(app, threads, amount):
+    """Approve one pending loan from ``threads`` clients at once. Returns (status counts, balance, disbursements)."""
+    from models import Account, Transaction
+
+    headers, account_id, loan_id = setup_loan_race(app, amount)
+    statuses = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker():
+        client = app.test_client()
+        start.wait()
+        response = client.patch(f"/approve/{loan_id}", headers=headers, json={"action": "approve"})
+        with lock:
+            statuses[response.status_code] += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    with app.app_context():
+        balance = Decimal(str(Account.query.get(account_id).balance))
+        disbursements = Transaction.query.filter_by(account_id=account_id, type="loan_disbursement").count()
+    return statuses, balance, disbursements
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per thread")
+    parser.add_argument("--opening-balance", type=float, default=1000)
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sacco-stress-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'stress.sqlite')}"
+    try:
+        app, headers, account_id = build_app(database_url)
+        from models import db, Account, Transaction
+
+        with app.app_context():
+            Account.query.get(account_id).deposit(args.opening_balance)
+            db.session.commit()
+
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            client = app.test_client()
+            for _ in range(args.requests):
+                action = rng.choice(["deposit", "withdraw", "withdraw"])
+                amount = rng.choice([1, 5, 10, 25, 50, 100])
+                response = client.post("/transaction", headers=headers,
+                                       json={"action": action, "amount": amount, "pin": "1234"})
+                with lock:
+                    outcomes[(action, response.status_code)] += 1
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            balance = Decimal(str(Account.query.get(account_id).balance))
+            ledger = Decimal("0.00")
+            for t in Transaction.query.filter_by(account_id=account_id):
+                amount = Decimal(str(t.amount))
+                ledger += amount if t.type == "deposit" else -amount
+            withdrawals = Transaction.query.filter_by(account_id=account_id, type="withdraw").count()
+
+        loan_amount = Decimal("1000.00")
+        approvals, loan_balance, disbursements = approve_race(app, args.threads, loan_amount)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    total = sum(outcomes.values())
+    print(f"{total} requests from {args.threads} threads in {elapsed:.2f}s ({total / elapsed:,.0f} req/s)")
+    for (action, status), count in sorted(outcomes.items()):
+        print(f"  {action:<8} {status}: {count}")
+    print(f"balance {balance}  ledger {ledger}")
+    print(f"{args.threads} concurrent approvals of one loan: "
+          + ", ".join(f"{status}: {count}" for status, count in sorted(approvals.items())))
+    print(f"borrower balance {loan_balance}  disbursements {disbursements}")
+
+    problems = []
+    if balance != ledger:
+        problems.append("stored balance does not match the transaction ledger")
+    if balance < 0:
+        problems.append("balance went negative")
+    if withdrawals != outcomes[("withdraw", 200)]:
+        problems.append("ledger withdrawals do not match successful responses")
+    if any(status >= 500 for _, status in outcomes):
+        problems.append("some requests failed with a server error")
+    if approvals[200] != 1 or approvals[409] + approvals[400] != args.threads - 1:
+        problems.append("a loan approval other than exactly one succeeded or failed unexpectedly")
+    if disbursements != 1 or loan_balance != loan_amount:
+        problems.append("the approved loan was not disbursed exactly once")
+
+    for problem in problems:
+        print("FAIL:", problem)
+    if problems:
+        raise SystemExit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
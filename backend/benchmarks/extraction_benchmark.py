@@ -0,0 +1,163 @@
+"""Throughput and peak RSS of the statement extractors and /upload.
+
+Every (page count, target) case runs in a fresh spawned process so its
+peak RSS is not inflated by earlier cases.
+
+    cd backend && python -m benchmarks.extraction_benchmark --pages 1 10 50 200
+"""
+import argparse
+import importlib
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+from benchmarks.statement_generator import generate_statement
+
+
+TARGETS = [
+    "is_mpesa_statement",
+    "extract_metadata",
+    "extract_summary_table",
+    "extract_transactions",
+    "upload",
+]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _extractor(target):
+    # views re-exports sqlalchemy's ``extract``, so import the module by name
+    extract = importlib.import_module("views.extract")
+    from views.upload import is_mpesa_statement
+
+    fn = is_mpesa_statement if target == "is_mpesa_statement" else getattr(extract, target)
+
+    def run(pdf_bytes, password):
+        # Opening is part of the cost: each extractor used to pay it on its own
+        with extract.StatementDocument(pdf_bytes, password) as statement:
+            result = fn(statement)
+        return len(result) if target == "extract_transactions" else 0
+
+    return None, run
+
+
+def _upload_flow(workdir):
+    import io
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+    from werkzeug.security import generate_password_hash
+    from models import db, Member
+    from views.upload import upload_bp
+
+    app = Flask(__name__, instance_path=workdir)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'bench.sqlite')}",
+        BLOB_STORE_PATH=os.path.join(workdir, "blobs"),
+        JWT_SECRET_KEY="sacco-extraction-benchmark-secret-key",
+        JWT_VERIFY_SUB=False,
+    )
+    db.init_app(app)
+    JWTManager(app)
+    app.register_blueprint(upload_bp)
+
+    with app.app_context():
+        # The analyst below is recreated with id 1 before every run
+        headers = {"Authorization": f"Bearer {create_access_token(identity=1)}"}
+
+    client = app.test_client()
+
+    def reset():
+        # Start from an empty store each time so the dedup cache never answers
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Member(first_name="Bench", last_name="Analyst", username="bench",
+                                  email="bench@example.com", password=generate_password_hash("password"),
+                                  is_analyst=True))
+            db.session.commit()
+        shutil.rmtree(os.path.join(workdir, "blobs"), ignore_errors=True)
+
+    def run(pdf_bytes, password):
+        data = {"file": (io.BytesIO(pdf_bytes), "statement.pdf")}
+        if password:
+            data["password"] = password
+        response = client.post("/upload", data=data, headers=headers, content_type="multipart/form-data")
+        if response.status_code != 200:
+            raise RuntimeError(f"/upload returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return len(response.get_json()["transactions"])
+
+    return reset, run
+
+
+def _run_case(target, pdf_path, password, repeat, queue):
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+
+    workdir = tempfile.mkdtemp(prefix="sacco-bench-")
+    try:
+        reset, run = _upload_flow(workdir) if target == "upload" else _extractor(target)
+        baseline_rss = _peak_rss_mb()
+
+        best, transactions = None, 0
+        for _ in range(repeat):
+            if reset:
+                reset()
+            started = time.perf_counter()
+            transactions = run(pdf_bytes, password)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+
+        queue.put((best, transactions, _peak_rss_mb(), _peak_rss_mb() - baseline_rss))
+    except Exception:
+        queue.put(traceback.format_exc())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(target, pdf_path, password, repeat):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_case, args=(target, pdf_path, password, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    if isinstance(result, str):
+        raise RuntimeError(f"{target} benchmark failed:\n{result}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--per-page", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--password", help="encrypt the generated statements with this password")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=TARGETS)
+    args = parser.parse_args()
+
+    print(f"{'pages':>5}  {'target':<22} {'best s':>8} {'pages/s':>9} {'txns/s':>10} {'peak MB':>8} {'+MB':>7}")
+    with tempfile.TemporaryDirectory(prefix="sacco-statements-") as tmp:
+        for pages in args.pages:
+            pdf_path = os.path.join(tmp, f"statement-{pages}.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(generate_statement(pages=pages, transactions_per_page=args.per_page,
+                                           password=args.password, seed=pages))
+
+            for target in args.targets:
+                best, transactions, peak, growth = measure(target, pdf_path, args.password, args.repeat)
+                txns_per_s = f"{transactions / best:,.0f}" if transactions else "-"
+                print(f"{pages:>5}  {target:<22} {best:>8.3f} {pages / best:>9,.1f} {txns_per_s:>10} "
+                      f"{peak:>8.1f} {growth:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Lines-per-second benchmark for the statement transaction parser.
+
+Compares the current single-pass parser against the original per-line
+``re.match`` implementation on a synthetic statement text stream.
+
+    cd backend && python -m benchmarks.parser_benchmark --rows 5000
+"""
+import argparse
+import random
+import re
+import time
+
+from views.extract import clean_amount, parse_transaction_lines
+
+
+DETAILS = [
+    ["Pay Bill to 888880 - KPLC PREPAID", "Acc. 54321098765"],
+    ["Customer Transfer to 2547******12 - JOHN DOE"],
+    ["Funds received from 2547******34 - MARY", "WANJIKU"],
+    ["Merchant Payment to 123456 - NAIVAS", "SUPERMARKET", "WESTLANDS"],
+    ["Airtime Purchase"],
+]
+
+
+def synthetic_lines(rows, seed=0):
+    rng = random.Random(seed)
+    balance = 50000.0
+    lines = []
+    for n in range(rows):
+        amount = round(rng.uniform(-2500, 2500), 2)
+        balance = round(balance + amount, 2)
+        lines.append("TF%08dQ" % n)
+        lines.append("2024-%02d-%02d %02d:%02d:%02d" % (
+            rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23), rng.randint(0, 59), rng.randint(0, 59)))
+        lines.extend(rng.choice(DETAILS))
+        lines.append("Completed")
+        lines.append("{:,.2f}".format(amount))
+        lines.append("{:,.2f}".format(balance))
+    return lines
+
+
+def legacy_parse(lines):
+    # The parser as it was before the single-pass rewrite, kept as a baseline
+    transactions = []
+    status_keywords = r"^(Completed|Failed|Pending)$"
+    receipt_no_pattern = r"^[A-Z0-9]{10,}$"
+    i = 0
+    while i < len(lines):
+        if re.match(receipt_no_pattern, lines[i].strip()):
+            receipt_no = lines[i].strip()
+            i += 1
+            if i >= len(lines): break
+            completion_time = lines[i].strip()
+            i += 1
+            if i >= len(lines): break
+            status_line_index = None
+            for j in range(i, min(i + 7, len(lines))):
+                if re.match(status_keywords, lines[j].strip()):
+                    status_line_index = j
+                    break
+            if status_line_index is None:
+                i += 1
+                continue
+            details = "\n".join([d.strip() for d in lines[i:status_line_index]])
+            transaction_status = lines[status_line_index].strip()
+            i = status_line_index + 1
+            monetary_fields = []
+            while i < len(lines) and len(monetary_fields) < 2:
+                line = lines[i].strip()
+                if re.match(r'^-?[\d,]+(\.\d{1,2})?$', line) or line in ["", "-"]:
+                    monetary_fields.append(line)
+                    i += 1
+                else:
+                    break
+            amount = clean_amount(monetary_fields[0]) if len(monetary_fields) > 0 else 0.0
+            balance = clean_amount(monetary_fields[1]) if len(monetary_fields) > 1 else 0.0
+            transactions.append({
+                "receipt_no": receipt_no,
+                "completion_time": completion_time,
+                "details": details,
+                "transaction_status": transaction_status,
+                "paid_in": amount if amount > 0 else 0.0,
+                "withdrawn": amount if amount < 0 else 0.0,
+                "balance": balance
+            })
+        else:
+            i += 1
+    return transactions
+
+
+def single_pass_parse(lines):
+    entries, _ = parse_transaction_lines(lines)
+    return [txn for _, txn in entries]
+
+
+def measure(parse, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = parse(lines)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lines = synthetic_lines(args.rows)
+    before, before_time = measure(legacy_parse, lines, args.repeat)
+    after, after_time = measure(single_pass_parse, lines, args.repeat)
+
+    if before != after:
+        raise SystemExit("Parsers disagree on the synthetic statement")
+
+    print(f"{args.rows} receipts, {len(lines)} lines (best of {args.repeat})")
+    print(f"  before: {len(lines) / before_time:12,.0f} lines/s  ({before_time * 1000:.1f} ms)")
+    print(f"  after:  {len(lines) / after_time:12,.0f} lines/s  ({after_time * 1000:.1f} ms)")
+    print(f"  speedup: {before_time / after_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Fail if a hot endpoint's queries fall back to a full table scan.
+
+Seeds a temporary SQLite database, calls each endpoint in ENDPOINTS,
+captures the SELECT/UPDATE/DELETE statements it issues and runs
+EXPLAIN QUERY PLAN on each one. A plan step that scans a table without
+an index fails the check, unless (endpoint, table) is listed in
+ALLOWED_SCANS because the endpoint reads the whole table by design.
+Endpoints in QUERY_BUDGETS (the former N+1 listings) also fail when a
+request issues more statements than its budget.
+
+    cd backend && python -m benchmarks.query_plan_check
+    cd backend && python -m benchmarks.query_plan_check --verbose
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+
+# (user, method, url, json body)
+ENDPOINTS = [
+    ("member", "GET", "/transaction_history", None),
+    ("member", "GET", "/transaction_history?cursor=", None),
+    ("member", "GET", "/notifications", None),
+    ("member", "GET", "/notifications?unread=true&cursor=", None),
+    ("member", "GET", "/unread-count", None),
+    ("member", "PATCH", "/read-all", None),
+    ("member", "PATCH", "/read/broadcast/1", None),
+    ("member", "GET", "/history", None),
+    ("member", "GET", "/history?cursor=", None),
+    ("member", "GET", "/check-loan-status/1", None),
+    ("member", "GET", "/repayment-history/1", None),
+    ("member", "GET", "/history/1", None),
+    ("member", "GET", "/balance", None),
+    ("admin", "GET", "/admin/notifications", None),
+    ("admin", "GET", "/admin/notifications?cursor=", None),
+    ("admin", "GET", "/loans-repayments", None),
+    ("admin", "GET", "/loans-repayments?status=approved", None),
+    ("admin", "GET", "/members?cursor=", None),
+]
+
+# Statements per request for the listings that used to be N+1; none may grow with the page size
+QUERY_BUDGETS = {
+    "/notifications": 5,
+    "/notifications?unread=true&cursor=": 5,
+    "/history": 5,
+    "/history?cursor=": 5,
+    "/admin/notifications": 5,
+    "/admin/notifications?cursor=": 5,
+    "/loans-repayments": 4,
+    "/loans-repayments?status=approved": 4,
+    "/members?cursor=": 4,
+}
+
+# (path, table) pairs where reading the whole table is the intended plan
+ALLOWED_SCANS = set()
+
+SCAN_RE = re.compile(r"^SCAN (\w+)$")
+# Subqueries SQLite runs as co-routines; scanning their output is not a table scan
+SUBQUERY_RE = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\w+)$")
+
+
+def build_app(database_url):
+    from flask import Flask
+    from flask_jwt_extended import JWTManager, create_access_token
+    from werkzeug.security import generate_password_hash
+    from models import (db, Member, Account, Loan, LoanRepayment, Notification, Transaction,
+                        BroadcastNotification)
+    from views.admin import admin_bp
+    from views.loan import loan_bp
+    from views.notification import notification_bp
+    from views.repayment import repayment_bp
+    from views.transaction import transaction_bp
+    from views.account import account_bp
+    from querystats import query_stats
+
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=database_url,
+        JWT_SECRET_KEY="sacco-query-plan-check-secret-key",
+        JWT_VERIFY_SUB=False,
+    )
+    db.init_app(app)
+    JWTManager(app)
+    query_stats.init_app(app)
+    for bp in (admin_bp, loan_bp, notification_bp, repayment_bp, transaction_bp, account_bp):
+        app.register_blueprint(bp)
+
+    with app.app_context():
+        db.create_all()
+        admin = Member(first_name="Ada", last_name="Admin", username="admin", email="admin@example.com",
+                       password="x", is_admin=True)
+        member = Member(first_name="Mo", last_name="Member", username="member", email="member@example.com",
+                        password="x", join_date=datetime(2023, 1, 1))
+        db.session.add_all([admin, member])
+        db.session.flush()
+
+        account = Account(member_id=member.id, pin=generate_password_hash("1234", method="pbkdf2:sha256:1000"))
+        db.session.add(account)
+        db.session.flush()
+
+        start = datetime(2024, 1, 1)
+        for n in range(20):
+            loan = Loan(member_id=member.id, amount=1000, purpose="Business",
+                        status="approved" if n % 2 else "pending", application_date=start + timedelta(days=n))
+            db.session.add(loan)
+            db.session.flush()
+            loan.refresh_outstanding()
+            db.session.add(LoanRepayment(loan_id=loan.id, amount=100, payment_date=start + timedelta(days=n + 1)))
+            db.session.add(Transaction(type="deposit", amount=100, account_id=account.id,
+                                       timestamp=start + timedelta(days=n)))
+            for recipient in (admin.id, member.id):
+                db.session.add(Notification(recipient_username=recipient, sender_id=admin.id, title="t",
+                                            message="m", type="loan_approved", loan_id=loan.id,
+                                            timestamp=start + timedelta(days=n)))
+            db.session.add(BroadcastNotification(sender_id=admin.id, title="t", message="m", type="general",
+                                                 timestamp=start + timedelta(days=n)))
+        db.session.commit()
+
+        headers = {
+            "admin": {"Authorization": f"Bearer {create_access_token(identity=admin.id)}"},
+            "member": {"Authorization": f"Bearer {create_access_token(identity=member.id)}"},
+        }
+
+    return app, headers
+
+
+def query_plans(app, headers, verbose=False):
+    from sqlalchemy import event
+    from models import db
+    from querystats import query_budget, QueryBudgetExceeded
+
+    failures = []
+    client = app.test_client()
+
+    with app.app_context():
+        engine = db.engine
+
+    for user, method, url, body in ENDPOINTS:
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                statements.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            with query_budget(QUERY_BUDGETS.get(url, float("inf"))):
+                response = client.open(url, method=method, headers=headers[user], json=body)
+        except QueryBudgetExceeded as e:
+            failures.append(f"{method} {url}: {e}".splitlines()[0])
+            continue
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        if response.status_code >= 400:
+            failures.append(f"{method} {url}: returned {response.status_code}")
+            continue
+
+        path = url.split("?")[0]
+        with engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+                subqueries = {m.group(1) for step in plan if (m := SUBQUERY_RE.match(step))}
+                scans = {m.group(1) for step in plan if (m := SCAN_RE.match(step))} - subqueries
+                bad = {table for table in scans if (path, table) not in ALLOWED_SCANS}
+                if verbose or bad:
+                    print(f"{method} {url}\n  {' '.join(statement.split())[:160]}")
+                    for step in plan:
+                        print(f"    {step}")
+                for table in sorted(bad):
+                    failures.append(f"{method} {url}: full scan of {table}")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not only failing ones")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sacco-plans-")
+    try:
+        app, headers = build_app(f"sqlite:///{os.path.join(workdir, 'plans.sqlite')}")
+        failures = query_plans(app, headers, verbose=args.verbose)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for failure in failures:
+        print("FAIL:", failure)
+    if failures:
+        raise SystemExit(1)
+    print(f"OK: {len(ENDPOINTS)} endpoints, no unindexed table scans, {len(QUERY_BUDGETS)} within their query budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Synthetic Safaricom-style M-PESA statements for benchmarks.
+
+Lays pages out like a real statement (customer block, summary table,
+detailed statement columns) and sets the document metadata that
+``is_valid_mpesa_document`` checks, so generated files pass the same
+validation as real uploads.
+
+    cd backend && python -m benchmarks.statement_generator out.pdf --pages 10
+"""
+import argparse
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import fitz
+
+from views.extract import KNOWN_MPESA_PROPERTIES
+
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+FONT_SIZE = 6
+LINE_HEIGHT = 8
+ROW_GAP = 4
+
+# x offset of each detailed statement column
+COLUMNS = {
+    "receipt_no": 30,
+    "completion_time": 85,
+    "details": 160,
+    "transaction_status": 330,
+    "paid_in": 385,
+    "withdrawn": 445,
+    "balance": 510,
+}
+COLUMN_TITLES = [
+    ("receipt_no", "Receipt No"),
+    ("completion_time", "Completion Time"),
+    ("details", "Details"),
+    ("transaction_status", "Transaction Status"),
+    ("paid_in", "Paid In"),
+    ("withdrawn", "Withdrawn"),
+    ("balance", "Balance"),
+]
+
+# (summary transaction type, paid in?, details lines)
+TRANSACTION_KINDS = [
+    ("SEND MONEY", False, ["Customer Transfer to 2547******12 -", "JOHN KAMAU"]),
+    ("RECEIVED MONEY", True, ["Funds received from 2547******34 -", "MARY WANJIKU"]),
+    ("LIPA NA M-PESA (PAYBILL)", False, ["Pay Bill to 888880 - KPLC PREPAID", "Acc. 54321098765"]),
+    ("LIPA NA M-PESA (BUY GOODS)", False, ["Merchant Payment to 512345 -", "NAIVAS SUPERMARKET", "WESTLANDS"]),
+    ("AGENT DEPOSIT", True, ["Deposit of Funds at Agent Till", "123456 - QUICKMART"]),
+    ("AIRTIME", False, ["Airtime Purchase"]),
+]
+
+
+def _money(value):
+    return "{:,.2f}".format(value)
+
+
+def _transactions(count, multiline_details, rng, start):
+    balance = round(rng.uniform(5000, 50000), 2)
+    when = start
+    rows = []
+    for n in range(count):
+        kind, paid_in, details = rng.choice(TRANSACTION_KINDS)
+        if not paid_in and balance < 100:
+            kind, paid_in, details = TRANSACTION_KINDS[1]
+        amount = round(rng.uniform(10, 5000 if paid_in else min(5000, balance)), 2)
+        balance = round(balance + amount if paid_in else balance - amount, 2)
+        when += timedelta(minutes=rng.randint(1, 600))
+        rows.append({
+            "kind": kind,
+            "receipt_no": "T%s%07d" % ("".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ") for _ in range(2)), n),
+            "completion_time": when.strftime("%Y-%m-%d %H:%M:%S"),
+            "details": details if multiline_details else [" ".join(details)],
+            "transaction_status": "Completed",
+            "paid_in": _money(amount) if paid_in else "",
+            "withdrawn": "" if paid_in else _money(-amount),
+            "balance": _money(balance),
+            "amount": amount if paid_in else -amount,
+        })
+    return rows
+
+
+def _write_column_titles(page, y):
+    for key, title in COLUMN_TITLES:
+        page.insert_text((COLUMNS[key], y), title, fontsize=FONT_SIZE)
+    return y + LINE_HEIGHT + ROW_GAP
+
+
+def _write_first_page_header(page, rows, customer, start, end):
+    y = 40
+    page.insert_text((30, y), "M-PESA STATEMENT", fontsize=12)
+    page.insert_text((400, y), "Safaricom PLC", fontsize=8)
+    y += 24
+
+    for label, value in [
+        ("Customer Name", customer["name"]),
+        ("Mobile Number", customer["mobile"]),
+        ("Email Address", customer["email"]),
+        ("Statement Period", f"{start:%d %b %Y} - {end:%d %b %Y}"),
+        ("Request Date", f"{end + timedelta(days=1):%d %b %Y}"),
+    ]:
+        page.insert_text((30, y), f"{label}: {value}", fontsize=7)
+        y += 10
+
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for row in rows:
+        totals[row["kind"]][0 if row["amount"] > 0 else 1] += abs(row["amount"])
+
+    # Each summary row is its own text block, which is what extract_summary_table reads
+    y += 14
+    page.insert_text((30, y), "SUMMARY", fontsize=8)
+    y += 16
+    page.insert_text((30, y), "TRANSACTION TYPE          PAID IN          PAID OUT", fontsize=7)
+    y += 16
+    for kind, _, _ in TRANSACTION_KINDS:
+        paid_in, paid_out = totals[kind]
+        page.insert_text((30, y), f"{kind}:   {_money(paid_in)}   {_money(paid_out)}", fontsize=7)
+        y += 16
+    y += 4
+    page.insert_text((30, y), "DETAILED STATEMENT", fontsize=8)
+    return y + 16
+
+
+def generate_statement(pages=1, transactions_per_page=25, password=None,
+                       multiline_details=True, seed=0, customer=None):
+    """Return the bytes of a synthetic M-PESA statement PDF."""
+    rng = random.Random(seed)
+    customer = customer or {
+        "name": "JANE WANJIKU DOE",
+        "mobile": "254712345678",
+        "email": "jane.doe@example.com",
+    }
+    start = datetime(2024, 1, 1)
+    rows = _transactions(pages * transactions_per_page, multiline_details, rng, start)
+    end = datetime.strptime(rows[-1]["completion_time"], "%Y-%m-%d %H:%M:%S") if rows else start
+
+    doc = fitz.open()
+    for page_index in range(pages):
+        page_rows = rows[page_index * transactions_per_page:(page_index + 1) * transactions_per_page]
+        needed = sum(len(r["details"]) * LINE_HEIGHT + ROW_GAP for r in page_rows) + 360
+        page = doc.new_page(width=PAGE_WIDTH, height=max(PAGE_HEIGHT, needed))
+
+        y = 40
+        if page_index == 0:
+            y = _write_first_page_header(page, rows, customer, start, end)
+        y = _write_column_titles(page, y)
+
+        # Cells are written in reading order so text extraction yields one cell per line
+        for row in page_rows:
+            page.insert_text((COLUMNS["receipt_no"], y), row["receipt_no"], fontsize=FONT_SIZE)
+            page.insert_text((COLUMNS["completion_time"], y), row["completion_time"], fontsize=FONT_SIZE)
+            for k, line in enumerate(row["details"]):
+                page.insert_text((COLUMNS["details"], y + k * LINE_HEIGHT), line, fontsize=FONT_SIZE)
+            for key in ("transaction_status", "paid_in", "withdrawn", "balance"):
+                if row[key]:
+                    page.insert_text((COLUMNS[key], y), row[key], fontsize=FONT_SIZE)
+            y += len(row["details"]) * LINE_HEIGHT + ROW_GAP
+
+        page.insert_text((30, page.rect.height - 20), f"Page {page_index + 1} of {pages}", fontsize=FONT_SIZE)
+
+    known = KNOWN_MPESA_PROPERTIES[0]
+    doc.set_metadata({
+        "subject": known["subject"],
+        "author": known["author"],
+        "keywords": known["keywords"],
+        "producer": known["producer"],
+        "creator": known["creator"],
+        "creationDate": fitz.get_pdf_now(),
+        "modDate": fitz.get_pdf_now(),
+    })
+    # extract_pdf_properties reads the version from the catalog (xref 1)
+    doc.xref_set_key(doc.pdf_catalog(), "Version", "/" + known["format"].split("-")[1])
+
+    if password:
+        return doc.tobytes(encryption=fitz.PDF_ENCRYPT_AES_256, user_pw=password, owner_pw=password + "-owner")
+    return doc.tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--per-page", type=int, default=25)
+    parser.add_argument("--password")
+    parser.add_argument("--single-line-details", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pdf_bytes = generate_statement(
+        pages=args.pages,
+        transactions_per_page=args.per_page,
+        password=args.password,
+        multiline_details=not args.single_line_details,
+        seed=args.seed,
+    )
+    with open(args.output, "wb") as f:
+        f.write(pdf_bytes)
+    print(f"Wrote {args.output} ({args.pages} pages, {len(pdf_bytes):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import hashlib
+import mmap
+import os
+import tempfile
+from flask import current_app
+
+
+def map_file(path):
+    # The mapping stays alive for as long as the returned view is referenced
+    with open(path, 'rb') as f:
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class LocalBlobStore:
+    """Content-addressed blobs on the local disk.
+
+    A blob's key is the sha256 of its bytes, stored as ``ab/cd/<hash>`` under
+    ``root``, so identical uploads share one file. Reads are memory-mapped.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        # Lets pool workers in other processes map the blob themselves
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data):
+        key = hashlib.sha256(data).hexdigest()
+        path = self.local_path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write a unique temp file then rename, so readers never see a partial file
+            # and concurrent writers of the same blob never share a temp file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        return key
+
+    def open(self, key):
+        return map_file(self.local_path(key))
+
+
+BLOB_STORES = {
+    "local": lambda app: LocalBlobStore(
+        app.config.get("BLOB_STORE_PATH") or os.path.join(app.instance_path, "blobs")
+    ),
+}
+
+
+def get_blob_store(app=None):
+    app = app or current_app._get_current_object()
+    store = app.extensions.get("blob_store")
+    if store is None:
+        store = BLOB_STORES[app.config.get("BLOB_STORE", "local")](app)
+        app.extensions["blob_store"] = store
+    return store
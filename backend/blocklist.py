@@ -0,0 +1,94 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, and_
+from models import db, TokenBlocklist
+
+
+class RevokedTokenCache:
+    """Process-local cache of revoked JWT ids.
+
+    ``token_in_blocklist_loader`` is called on every authenticated request,
+    so lookups are answered from memory. Other workers' logouts are picked
+    up by polling for blocklist rows above the highest id seen so far
+    (``JWT_BLOCKLIST_SYNC_SECONDS``), and rows for tokens that have expired
+    anyway are pruned from the table (``JWT_BLOCKLIST_PRUNE_SECONDS``).
+    """
+
+    def __init__(self):
+        self._expires = {}  # jti -> expiry (naive UTC), None if it never expires
+        self._high_water_id = 0
+        self._warmed = False
+        self._last_sync = 0.0
+        self._last_prune = time.monotonic()
+        self._lock = threading.Lock()
+        self.sync_interval = 5
+        self.prune_interval = 3600
+        self.token_ttl = None
+
+    def init_app(self, app):
+        self.sync_interval = app.config.get("JWT_BLOCKLIST_SYNC_SECONDS", 5)
+        self.prune_interval = app.config.get("JWT_BLOCKLIST_PRUNE_SECONDS", 3600)
+        expires = app.config.get("JWT_ACCESS_TOKEN_EXPIRES")
+        self.token_ttl = expires if isinstance(expires, timedelta) else None
+        app.extensions["revoked_tokens"] = self
+
+    def _expiry_of(self, created_at, expires_at):
+        # Rows written before expires_at existed fall back to the token lifetime
+        if expires_at is None and created_at is not None and self.token_ttl:
+            return created_at + self.token_ttl
+        return expires_at
+
+    def add(self, jti, expires_at=None):
+        with self._lock:
+            self._expires[jti] = expires_at
+
+    def is_revoked(self, jti):
+        now = time.monotonic()
+        if not self._warmed or now - self._last_sync >= self.sync_interval:
+            self.sync()
+        if now - self._last_prune >= self.prune_interval:
+            self.prune()
+
+        with self._lock:
+            return jti in self._expires
+
+    def sync(self):
+        """Load blocklist rows added since the last sync (all of them the first time)."""
+        rows = db.session.query(
+            TokenBlocklist.id, TokenBlocklist.jti, TokenBlocklist.created_at, TokenBlocklist.expires_at
+        ).filter(TokenBlocklist.id > self._high_water_id).order_by(TokenBlocklist.id).all()
+
+        utcnow = datetime.utcnow()
+        with self._lock:
+            for row in rows:
+                expiry = self._expiry_of(row.created_at, row.expires_at)
+                if expiry is None or expiry > utcnow:
+                    self._expires[row.jti] = expiry
+                self._high_water_id = max(self._high_water_id, row.id)
+            self._warmed = True
+            self._last_sync = time.monotonic()
+
+    def prune(self):
+        """Forget and delete revoked tokens that are past their own expiry."""
+        utcnow = datetime.utcnow()
+        with self._lock:
+            self._expires = {
+                jti: expiry for jti, expiry in self._expires.items()
+                if expiry is None or expiry > utcnow
+            }
+            self._last_prune = time.monotonic()
+
+        expired = TokenBlocklist.expires_at < utcnow
+        if self.token_ttl:
+            expired = or_(expired, and_(
+                TokenBlocklist.expires_at.is_(None),
+                TokenBlocklist.created_at < utcnow - self.token_ttl
+            ))
+
+        # Own connection so pruning never commits the caller's session
+        with db.engine.begin() as conn:
+            return conn.execute(delete(TokenBlocklist).where(expired)).rowcount
+
+
+revoked_tokens = RevokedTokenCache()
@@ -1,16 +1,39 @@
-from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask import jsonify, g, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
 from functools import wraps
 from models import Member
 
+
+def role_claims(member):
+    # Embedded in the access token so role checks need no database hit
+    if not current_app.config.get("JWT_ROLE_CLAIMS", True):
+        return {}
+    return {"is_admin": bool(member.is_admin), "is_analyst": bool(member.is_analyst)}
+
+
+def get_current_member():
+    """The authenticated Member, loaded at most once per request."""
+    if "current_member" not in g:
+        g.current_member = Member.query.get(get_jwt_identity())
+    return g.current_member
+
+
+def _has_role(role):
+    claims = get_jwt()
+    if role in claims:
+        return bool(claims[role])
+
+    # Tokens issued without role claims fall back to the member row
+    user = get_current_member()
+    return bool(user and getattr(user, role))
+
+
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        user = Member.query.get(user_id)
 
-        if not user or not user.is_admin:
+        if not _has_role("is_admin"):
             return jsonify({"error": "Admin access required"}), 403
 
         return fn(*args, **kwargs)
@@ -21,11 +44,9 @@ def analyst_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        user = Member.query.get(user_id)
 
-        if not user or not user.is_analyst:
+        if not _has_role("is_analyst"):
             return jsonify({"error": "Data Analyst access required"}), 403
 
         return fn(*args, **kwargs)
-    return wrapper
\ No newline at end of file
+    return wrapper
@@ -0,0 +1,168 @@
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, current_app, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import db, IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+CLAIM_KEY = "idempotency_claim"
+
+
+class ClaimLost(RuntimeError):
+    """A retry took over the idempotency key while this request was still running."""
+
+
+@event.listens_for(Session, "before_commit")
+def _mark_committed(session):
+    # The view's first commit marks the key 'committed' in the same transaction,
+    # so its writes and the key can never disagree. A request whose claim was
+    # taken over aborts its commit instead of applying the writes a second time.
+    claim = session.info.pop(CLAIM_KEY, None)
+    if claim is None:
+        return
+    marked = session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.id == claim["id"], IdempotencyKey.claimed_at == claim["claimed_at"],
+               IdempotencyKey.status == 'in_progress')
+        .values(status='committed')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if marked != 1:
+        raise ClaimLost("the idempotency key was taken over by a retry")
+
+
+def _claim_key(member_id, key, request_hash):
+    """Insert an in-progress record for the key, or return the one already there.
+
+    Returns (record, claimed). An in-progress record (nothing committed yet)
+    whose claim is older than ``IDEMPOTENCY_CLAIM_TIMEOUT`` belongs to a
+    request that died or hangs; a retry of the same request takes the claim
+    over. Committed and done records are never taken over.
+    """
+    ttl = current_app.config.get("IDEMPOTENCY_KEY_TTL", timedelta(hours=24))
+    claim_timeout = current_app.config.get("IDEMPOTENCY_CLAIM_TIMEOUT", timedelta(minutes=1))
+    now = datetime.utcnow()
+
+    for _ in range(2):
+        record = IdempotencyKey(
+            member_id=member_id,
+            key=key,
+            method=request.method,
+            path=request.path,
+            request_hash=request_hash,
+            created_at=now,
+            claimed_at=now,
+            expires_at=now + ttl
+        )
+        db.session.add(record)
+        try:
+            db.session.commit()
+            return record, True
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = IdempotencyKey.query.filter_by(member_id=member_id, key=key).first()
+        if existing is None:
+            continue
+        if existing.expires_at > now:
+            same_request = (existing.method, existing.path, existing.request_hash) == \
+                (request.method, request.path, request_hash)
+            if existing.status != 'in_progress' or not same_request or existing.claimed_at >= now - claim_timeout:
+                return existing, False
+
+            # Only one retry wins the stale claim
+            taken = IdempotencyKey.query.filter(
+                IdempotencyKey.id == existing.id,
+                IdempotencyKey.status == 'in_progress',
+                IdempotencyKey.claimed_at == existing.claimed_at
+            ).update({"claimed_at": now}, synchronize_session=False)
+            db.session.commit()
+            db.session.refresh(existing)
+            return existing, taken == 1
+
+        # An expired key may be reused for a new request
+        db.session.delete(existing)
+        db.session.commit()
+
+    return None, False
+
+
+def idempotent(fn):
+    """Answer retries that carry the same Idempotency-Key from the stored response.
+
+    Goes below @jwt_required(): keys are scoped to the authenticated member.
+    The view's commit also marks the key 'committed', and the response is
+    stored right after; a view that never committed and answered 5xx releases
+    the key, so a retry runs it again. A retry while the first request is
+    still running gets a 409, unless nothing was committed yet and the claim
+    is older than ``IDEMPOTENCY_CLAIM_TIMEOUT``: the retry then runs the view
+    and the first request can no longer commit.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most 255 characters"}), 400
+
+        member_id = get_jwt_identity()
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+        record, claimed = _claim_key(member_id, key, request_hash)
+        if record is None:
+            return jsonify({"error": "Could not reserve the idempotency key, please retry"}), 409
+
+        if not claimed:
+            if (record.method, record.path, record.request_hash) != (request.method, request.path, request_hash):
+                return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used for a different request"}), 422
+            if record.status == 'committed':
+                # Applied, but the response was not stored (yet); never run it again
+                return jsonify({"error": "A request with this idempotency key was already applied; "
+                                         "its response is not available yet"}), 409
+            if record.status != 'done':
+                return jsonify({"error": "A request with this idempotency key is still being processed"}), 409
+
+            replay = Response(record.response_body, status=record.response_code, mimetype=record.response_mimetype)
+            replay.headers['Idempotent-Replayed'] = 'true'
+            return replay
+
+        # A request whose claim was taken over must not touch the record
+        ours = {"id": record.id, "claimed_at": record.claimed_at}
+        db.session.info[CLAIM_KEY] = ours
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            db.session.info.pop(CLAIM_KEY, None)
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(status='in_progress', **ours).delete()
+            db.session.commit()
+            raise
+        finally:
+            db.session.info.pop(CLAIM_KEY, None)
+
+        # Views commit (or roll back) their own work before the response is stored
+        db.session.rollback()
+        # A 5xx releases the key only when the view committed nothing; otherwise
+        # it is stored like any other response so a retry cannot apply it twice
+        released = response.status_code >= 500 and \
+            IdempotencyKey.query.filter_by(status='in_progress', **ours).delete()
+        if not released:
+            IdempotencyKey.query.filter_by(**ours).update({
+                "status": 'done',
+                "response_code": response.status_code,
+                "response_body": response.get_data(as_text=True),
+                "response_mimetype": response.mimetype
+            })
+        db.session.commit()
+        return response
+    return wrapper
+
+
+def prune_expired_keys():
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.expires_at < datetime.utcnow()).delete()
+    db.session.commit()
+    return deleted
@@ -0,0 +1,82 @@
+from decimal import Decimal
+from sqlalchemy import func
+from models import db, Loan, LoanRepayment
+
+CENT = Decimal('0.01')
+
+
+def _repayment_sums(loan_ids=None):
+    query = db.session.query(
+        LoanRepayment.loan_id,
+        func.coalesce(func.sum(LoanRepayment.amount), 0),
+        func.coalesce(func.sum(LoanRepayment.principal_component), 0),
+        func.coalesce(func.sum(LoanRepayment.interest_component), 0)
+    ).group_by(LoanRepayment.loan_id)
+    if loan_ids is not None:
+        query = query.filter(LoanRepayment.loan_id.in_(loan_ids))
+
+    return {
+        loan_id: tuple(Decimal(str(value)).quantize(CENT) for value in sums)
+        for loan_id, *sums in query.all()
+    }
+
+
+def _loans(loan_ids=None):
+    query = Loan.query.order_by(Loan.id)
+    if loan_ids is not None:
+        query = query.filter(Loan.id.in_(loan_ids))
+    return query.all()
+
+
+def recompute_loan_totals(loan_ids=None):
+    """Rebuild the stored repayment totals from the repayment rows. Returns the number of loans changed."""
+    sums = _repayment_sums(loan_ids)
+    changed = 0
+    zero = (Decimal('0.00'),) * 3
+
+    for loan in _loans(loan_ids):
+        total, principal, interest = sums.get(loan.id, zero)
+        before = (loan.total_repaid, loan.principal_repaid, loan.interest_repaid, loan.outstanding_balance)
+
+        loan.total_repaid, loan.principal_repaid, loan.interest_repaid = total, principal, interest
+        loan.refresh_outstanding()
+
+        if before != (loan.total_repaid, loan.principal_repaid, loan.interest_repaid, loan.outstanding_balance):
+            changed += 1
+
+    db.session.commit()
+    return changed
+
+
+def check_loan_totals(loan_ids=None):
+    """Loans whose stored totals disagree with their repayment rows."""
+    sums = _repayment_sums(loan_ids)
+    zero = (Decimal('0.00'),) * 3
+    mismatches = []
+
+    for loan in _loans(loan_ids):
+        expected = sums.get(loan.id, zero)
+        stored = tuple(Decimal(str(value or 0)).quantize(CENT)
+                       for value in (loan.total_repaid, loan.principal_repaid, loan.interest_repaid))
+        expected_outstanding = max(loan.total_due - expected[0], Decimal('0.00')).quantize(CENT)
+        stored_outstanding = (Decimal(str(loan.outstanding_balance)).quantize(CENT)
+                              if loan.outstanding_balance is not None else None)
+
+        if stored != expected or stored_outstanding != expected_outstanding:
+            mismatches.append({
+                "loan_id": loan.id,
+                "stored": {
+                    "total_repaid": stored[0],
+                    "principal_repaid": stored[1],
+                    "interest_repaid": stored[2],
+                    "outstanding_balance": stored_outstanding
+                },
+                "expected": {
+                    "total_repaid": expected[0],
+                    "principal_repaid": expected[1],
+                    "interest_repaid": expected[2],
+                    "outstanding_balance": expected_outstanding
+                }
+            })
+
+    return mismatches
@@ -0,0 +1,55 @@
+"""moved pdf content to blob store
+
+Revision ID: 395222f91efd
+Revises: 2dfe477619a0
+Create Date: 2026-10-17 03:19:10.640381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from blobstore import get_blob_store
+
+
+# revision identifiers, used by Alembic.
+revision = '395222f91efd'
+down_revision = '2dfe477619a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pdf_document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('storage_key', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('size', sa.Integer(), nullable=True))
+
+    # Move every stored PDF out of the database into the blob store
+    store = get_blob_store()
+    conn = op.get_bind()
+    for row in conn.execute(sa.text("SELECT id, content FROM pdf_document")):
+        conn.execute(
+            sa.text("UPDATE pdf_document SET storage_key = :key, size = :size WHERE id = :id"),
+            {"key": store.put(row.content), "size": len(row.content), "id": row.id}
+        )
+
+    with op.batch_alter_table('pdf_document', schema=None) as batch_op:
+        batch_op.alter_column('storage_key', existing_type=sa.String(length=255), nullable=False)
+        batch_op.alter_column('size', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('content')
+
+
+def downgrade():
+    with op.batch_alter_table('pdf_document', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content', sa.BLOB(), nullable=True))
+
+    store = get_blob_store()
+    conn = op.get_bind()
+    for row in conn.execute(sa.text("SELECT id, storage_key FROM pdf_document")):
+        conn.execute(
+            sa.text("UPDATE pdf_document SET content = :content WHERE id = :id"),
+            {"content": bytes(store.open(row.storage_key)), "id": row.id}
+        )
+
+    with op.batch_alter_table('pdf_document', schema=None) as batch_op:
+        batch_op.alter_column('content', existing_type=sa.BLOB(), nullable=False)
+        batch_op.drop_column('size')
+        batch_op.drop_column('storage_key')
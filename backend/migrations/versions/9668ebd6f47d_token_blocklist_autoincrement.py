@@ -0,0 +1,29 @@
+"""token blocklist autoincrement
+
+Revision ID: 9668ebd6f47d
+Revises: 9b8e51ef23ef
+Create Date: 2026-10-17 04:10:12.481203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9668ebd6f47d'
+down_revision = '9b8e51ef23ef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite can only add AUTOINCREMENT by rebuilding the table; rows keep their ids
+    with op.batch_alter_table('token_blocklist', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+
+
+def downgrade():
+    with op.batch_alter_table('token_blocklist', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
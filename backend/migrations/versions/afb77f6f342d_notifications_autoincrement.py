@@ -0,0 +1,29 @@
+"""notifications autoincrement
+
+Revision ID: afb77f6f342d
+Revises: ffd7a5c20475
+Create Date: 2026-10-17 04:31:47.902615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'afb77f6f342d'
+down_revision = 'ffd7a5c20475'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite can only add AUTOINCREMENT by rebuilding the table; rows keep their ids
+    with op.batch_alter_table('notifications', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
@@ -0,0 +1,40 @@
+"""unread counters cover direct notifications only
+
+Revision ID: ffd7a5c20475
+Revises: fe7055187fa9
+Create Date: 2026-10-17 04:20:11.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ffd7a5c20475'
+down_revision = 'fe7055187fa9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Unread broadcasts are now counted when read; drop them from the counters
+    op.execute("""
+        UPDATE members SET unread_notifications =
+            (SELECT COUNT(*) FROM notifications
+             WHERE notifications.recipient_username = members.id AND notifications.is_read = 0)
+    """)
+
+
+def downgrade():
+    op.execute("""
+        UPDATE members SET unread_notifications =
+            (SELECT COUNT(*) FROM notifications
+             WHERE notifications.recipient_username = members.id AND notifications.is_read = 0)
+          + (SELECT COUNT(*) FROM broadcast_notification
+             LEFT JOIN broadcast_receipt ON broadcast_receipt.broadcast_id = broadcast_notification.id
+                                        AND broadcast_receipt.member_id = members.id
+             WHERE broadcast_notification.sender_id != members.id
+               AND (members.join_date IS NULL OR broadcast_notification.timestamp >= members.join_date)
+               AND broadcast_receipt.read_at IS NULL
+               AND (broadcast_receipt.deleted IS NULL OR broadcast_receipt.deleted = 0))
+    """)
@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData, ForeignKey, CheckConstraint
+from sqlalchemy import MetaData, ForeignKey, CheckConstraint, update, event, case, func
 from datetime import datetime
 from werkzeug.security import generate_password_hash
 from decimal import Decimal
@@ -19,10 +19,17 @@ class Member(db.Model):
     join_date = db.Column(db.DateTime, default=datetime.utcnow)
     is_admin = db.Column(db.Boolean, default=False)
     is_analyst = db.Column (db.Boolean, default=False)
+    # Unread direct notifications, kept in step by the writers; unread broadcasts are counted on read
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     profile_picture = db.Column(db.String(256), nullable=True, default='https://media.istockphoto.com/id/1337144146/vector/default-avatar-profile-icon-vector.jpg?s=612x612&w=0&k=20&c=BIbFwuv7FxTWvh5S3vB6bkT0Qv8Vn8N5Ffseq84ClGI=')
 
     account = db.relationship('Account', backref='member', uselist=False, lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_members_join_date', 'join_date', 'id'),
+        db.Index('ix_members_is_admin', 'is_admin'),
+    )
+
     # Specify foreign_keys to resolve ambiguity
     loans = db.relationship('Loan', foreign_keys='Loan.member_id', backref='borrower', lazy=True)
     guaranteed_loans = db.relationship(
@@ -67,21 +74,42 @@ class Account(db.Model):
     # __table_args__ = (
     #     CheckConstraint('balance >= minimum_balance', name='account_min_balance_check'),
     # )
+    __table_args__ = (
+        db.Index('ix_account_member_id', 'member_id'),
+    )
 
     def set_pin(self, pin):
         self.pin = generate_password_hash(pin)
 
+    # Balances change through single UPDATE statements evaluated by the
+    # database, so concurrent workers can neither lose an update nor both
+    # pass the funds check. The in-memory balance is expired and reloads.
+    def _apply_balance_change(self, delta, require_funds=None):
+        if self.id is None:
+            db.session.flush()
+
+        stmt = update(Account).where(Account.id == self.id).values(balance=Account.balance + delta)
+        if require_funds is not None:
+            stmt = stmt.where(Account.balance >= require_funds)
+
+        result = db.session.execute(stmt, execution_options={"synchronize_session": False})
+        db.session.expire(self, ['balance'])
+        return result.rowcount == 1
+
     def deposit(self, amount):
         amount = Decimal(str(amount))  # convert to Decimal
-        self.balance += amount
+        self._apply_balance_change(amount)
         transaction = Transaction(type="deposit", amount=amount, account_id=self.id)
         db.session.add(transaction)
 
     def withdraw(self, amount):
+        """Withdraw if the balance covers it; returns False (and records nothing) otherwise."""
         amount = Decimal(str(amount))  # convert to Decimal
-        self.balance -= amount
+        if not self._apply_balance_change(-amount, require_funds=amount):
+            return False
         transaction = Transaction(type="withdraw", amount=amount, account_id=self.id)
         db.session.add(transaction)
+        return True
 
     def __repr__(self):
         return f"<Account {self.id} - Balance: {self.balance}>"
@@ -97,6 +125,11 @@ class Transaction(db.Model):
 
     loan_id = db.Column(db.Integer, db.ForeignKey('loans.id'))
 
+    __table_args__ = (
+        # Keyset pagination of an account's history: ?cursor= on /transaction_history
+        db.Index('ix_transaction_account_timestamp', 'account_id', 'timestamp', 'id'),
+    )
+
     def __repr__(self):
         return f"<Transaction {self.id} - {self.type} {self.amount}>"
 
@@ -112,10 +145,76 @@ class Loan(db.Model):
     purpose = db.Column(db.String(100), nullable=False )  # e.g., "Business", "Education"
     status = db.Column(db.String(20), default='pending')  # pending/approved/rejected/paid
     guarantor_username = db.Column(db.String(100), db.ForeignKey('members.username'))  # Changed from guarantor_id
+
+    # Running repayment totals, kept in step by apply_repayment/remove_repayment
+    total_repaid = db.Column(db.Numeric(10, 2), default=Decimal('0.00'), server_default='0', nullable=False)
+    principal_repaid = db.Column(db.Numeric(10, 2), default=Decimal('0.00'), server_default='0', nullable=False)
+    interest_repaid = db.Column(db.Numeric(10, 2), default=Decimal('0.00'), server_default='0', nullable=False)
+    outstanding_balance = db.Column(db.Numeric(10, 2))
     # approved_by_username = db.Column(db.String(100), db.ForeignKey('members.username'))  # Changed from approved_by
      
 
     repayments = db.relationship('LoanRepayment', backref='loan', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_loans_member_application_date', 'member_id', 'application_date', 'id'),
+        # Admin loans-repayments report, with and without ?status=
+        db.Index('ix_loans_status_application_date', 'status', 'application_date'),
+        db.Index('ix_loans_application_date', 'application_date'),
+    )
+
+    @property
+    def total_due(self):
+        return Decimal(str(self.amount)) * (Decimal('1') + Decimal(str(self.interest_rate)) / Decimal('100'))
+
+    @property
+    def interest_due(self):
+        return Decimal(str(self.amount)) * (Decimal(str(self.interest_rate)) / Decimal('100'))
+
+    def refresh_outstanding(self):
+        self.outstanding_balance = max(self.total_due - (self.total_repaid or Decimal('0.00')), Decimal('0.00'))
+
+    # Totals change through single UPDATE statements evaluated by the database
+    # (as Account balances do), so concurrent repayments cannot lose an update.
+    # The in-memory totals are expired and the new ones come back from the row.
+    def _change_totals(self, amount, principal, interest, *criteria):
+        total_due = Loan.amount + Loan.amount * Loan.interest_rate / 100.0
+        remaining = total_due - (Loan.total_repaid + amount)
+        stmt = update(Loan).where(Loan.id == self.id, *criteria).values(
+            total_repaid=Loan.total_repaid + amount,
+            principal_repaid=Loan.principal_repaid + principal,
+            interest_repaid=Loan.interest_repaid + interest,
+            outstanding_balance=case((remaining > 0, remaining), else_=0)
+        ).returning(Loan.total_repaid, Loan.outstanding_balance)
+
+        row = db.session.execute(stmt, execution_options={"synchronize_session": False}).first()
+        db.session.expire(self, ['total_repaid', 'principal_repaid', 'interest_repaid', 'outstanding_balance'])
+        return row
+
+    # Status moves are conditional UPDATEs: of several concurrent requests only
+    # one can take the loan out of ``from_status`` (and, say, disburse it).
+    def change_status(self, from_status, to_status, **values):
+        stmt = update(Loan).where(Loan.id == self.id, Loan.status == from_status)\
+            .values(status=to_status, **values)
+        result = db.session.execute(stmt, execution_options={"synchronize_session": False})
+        db.session.expire(self, ['status', *values])
+        return result.rowcount == 1
+
+    def apply_repayment(self, amount, principal_component, interest_component):
+        """Add a repayment split from this loan's loaded ``interest_repaid``.
+
+        Returns the new (total_repaid, outstanding_balance), or None when the
+        loan is no longer approved or another repayment changed
+        ``interest_repaid`` first (refresh the loan and split again).
+        """
+        return self._change_totals(amount, principal_component, interest_component,
+                                   Loan.status == 'approved',
+                                   func.round(Loan.interest_repaid, 2) == self.interest_repaid)
+
+    def remove_repayment(self, repayment):
+        """Take a repayment back out of the totals. Returns the new (total_repaid, outstanding_balance)."""
+        return self._change_totals(-repayment.amount, -(repayment.principal_component or 0),
+                                   -(repayment.interest_component or 0))
    
 
     
@@ -130,6 +229,10 @@ class LoanRepayment(db.Model):
 
     principal_component = db.Column(db.Numeric(10, 2), default=0.0)
     interest_component = db.Column(db.Numeric(10, 2), default=0.0)
+
+    __table_args__ = (
+        db.Index('ix_loan_repayments_loan_payment_date', 'loan_id', 'payment_date'),
+    )
     
 
     
@@ -148,6 +251,107 @@ class Notification(db.Model):
 
     # Relationship
     loan = db.relationship('Loan', backref='notifications')
+
+    __table_args__ = (
+        db.Index('ix_notifications_recipient_timestamp', 'recipient_username', 'timestamp', 'id'),
+        db.Index('ix_notifications_timestamp', 'timestamp', 'id'),
+        # Unread counts, ?unread=true listings and read-all
+        db.Index('ix_notifications_recipient_unread', 'recipient_username', 'is_read', 'timestamp'),
+        # Loan history status notifications
+        db.Index('ix_notifications_loan_type', 'loan_id', 'type'),
+        # Archived notifications keep their ids, so ids of moved rows must never be reused
+        {'sqlite_autoincrement': True},
+    )
+
+
+# One row per broadcast; members see it at read time instead of getting a copy each
+class BroadcastNotification(db.Model):
+    __tablename__ = 'broadcast_notification'
+    id = db.Column(db.Integer, primary_key=True)
+    sender_id = db.Column(db.Integer, db.ForeignKey('members.id'), nullable=False)
+    title = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    type = db.Column(db.String(50))
+    loan_id = db.Column(db.Integer, db.ForeignKey('loans.id'), nullable=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    sender = db.relationship('Member', foreign_keys=[sender_id])
+
+    __table_args__ = (
+        db.Index('ix_broadcast_notification_timestamp', 'timestamp', 'id'),
+    )
+
+
+# Per-member read/deleted state of a broadcast; no row means unread
+class BroadcastReceipt(db.Model):
+    __tablename__ = 'broadcast_receipt'
+    broadcast_id = db.Column(db.Integer, db.ForeignKey('broadcast_notification.id', ondelete='CASCADE'), primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('members.id'), primary_key=True)
+    read_at = db.Column(db.DateTime)
+    deleted = db.Column(db.Boolean, default=False, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_broadcast_receipt_member', 'member_id', 'broadcast_id'),
+    )
+
+
+# Notifications waiting to be written by the dispatch worker; rows are deleted once written
+class NotificationOutbox(db.Model):
+    __tablename__ = 'notification_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    audience = db.Column(db.String(20), default='member', nullable=False)  # 'member' or 'admins'
+    recipient_username = db.Column(db.String(100))  # for audience 'member'
+    sender_id = db.Column(db.Integer, db.ForeignKey('members.id'), nullable=True)
+    title = db.Column(db.String(100), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    type = db.Column(db.String(50))
+    loan_id = db.Column(db.Integer, db.ForeignKey('loans.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending/processing/failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claim_token = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at', 'id'),
+        db.Index('ix_notification_outbox_claim_token', 'claim_token'),
+    )
+
+
+# Read notifications moved out of the hot table by the retention job;
+# one zlib-compressed JSON list of rows per archived chunk
+class NotificationArchive(db.Model):
+    __tablename__ = 'notification_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    first_notification_id = db.Column(db.Integer, nullable=False)
+    last_notification_id = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    oldest_timestamp = db.Column(db.DateTime)
+    newest_timestamp = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+
+def unread_counter_update(delta, *criteria):
+    """UPDATE adding ``delta`` to the unread counter of the members matching ``criteria``."""
+    return update(Member).where(*criteria)\
+        .values(unread_notifications=Member.unread_notifications + delta)\
+        .execution_options(synchronize_session=False)
+
+
+# Direct notifications are created and deleted in many places; count them at flush
+@event.listens_for(Notification, 'after_insert')
+def _count_new_notification(mapper, connection, target):
+    if not target.is_read:
+        connection.execute(unread_counter_update(1, Member.id == target.recipient_username))
+
+
+@event.listens_for(Notification, 'after_delete')
+def _uncount_deleted_notification(mapper, connection, target):
+    if not target.is_read:
+        connection.execute(unread_counter_update(-1, Member.id == target.recipient_username))
     
 
 
@@ -167,9 +371,25 @@ class PdfDocument(db.Model):
     __tablename__ = 'pdf_document'  
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String, nullable=False)
-    content = db.Column(db.LargeBinary, nullable=False)
+    storage_key = db.Column(db.String(255), nullable=False)  # key of the PDF bytes in the blob store
+    size = db.Column(db.Integer, nullable=False)
+    content_hash = db.Column(db.String(64), unique=True, index=True)  # sha256 of content, for re-upload dedup
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
+# Background analysis of an uploaded PDF
+class UploadJob(db.Model):
+    __tablename__ = 'upload_job'
+    id = db.Column(db.Integer, primary_key=True)
+    pdf_id = db.Column(db.Integer, db.ForeignKey('pdf_document.id'), nullable=False, index=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('members.id'), nullable=False)
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued/running/done/failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    pdf = db.relationship('PdfDocument', backref=db.backref('upload_jobs', lazy=True))
+
 # Spending Summary model
 class SpendingSummary(db.Model):
     __tablename__ = 'spending_summary'
@@ -194,6 +414,30 @@ class ReceivedSummary(db.Model):
     pdf = db.relationship('PdfDocument', backref=db.backref('received_summaries', lazy=True))
 
 
+# Statement Transaction model (one row per receipt extracted from a PDF)
+class StatementTransaction(db.Model):
+    __tablename__ = 'statement_transaction'
+    id = db.Column(db.Integer, primary_key=True)
+    pdf_id = db.Column(db.Integer, db.ForeignKey('pdf_document.id'), nullable=False)
+    receipt_no = db.Column(db.String(32), nullable=False)
+    completed_at = db.Column(db.DateTime)  # parsed completion time, None if unparseable
+    completion_time = db.Column(db.String(32))  # raw value as printed on the statement
+    details = db.Column(db.Text)
+    category = db.Column(db.String(255))  # details on one line, same key as the summaries
+    transaction_status = db.Column(db.String(20))
+    paid_in = db.Column(db.Float, default=0.0)
+    withdrawn = db.Column(db.Float, default=0.0)
+    balance = db.Column(db.Float, default=0.0)
+
+    pdf = db.relationship('PdfDocument', backref=db.backref('statement_transactions', lazy=True))
+
+    __table_args__ = (
+        db.Index('ix_statement_transaction_pdf_date', 'pdf_id', 'completed_at'),
+        db.Index('ix_statement_transaction_pdf_category', 'pdf_id', 'category', 'completed_at'),
+        db.Index('ix_statement_transaction_pdf_receipt', 'pdf_id', 'receipt_no'),
+    )
+
+
 # # Total Summary model
 # class TotalSummary(db.Model):
 #     __tablename__ = 'total_summary'
@@ -226,4 +470,30 @@ class TokenBlocklist(db.Model):
     __tablename__ = 'token_blocklist'
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(36), nullable=False, index=True)
-    created_at = db.Column(db.DateTime, nullable=False)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, index=True)  # when the revoked token would have expired anyway
+
+    # Workers sync on id > high-water mark, so ids of pruned rows must never be reused
+    __table_args__ = {'sqlite_autoincrement': True}
+
+
+# Stored responses for requests sent with an Idempotency-Key header
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_key'
+    id = db.Column(db.Integer, primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('members.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    method = db.Column(db.String(10), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of the request body
+    status = db.Column(db.String(20), default='in_progress', nullable=False)  # in_progress/committed/done
+    response_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    response_mimetype = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claimed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # when the running request took the key
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('member_id', 'key', name='uq_idempotency_key_member_key'),
+    )
\ No newline at end of file
@@ -0,0 +1,80 @@
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, or_
+from models import db, Notification, NotificationArchive
+
+ARCHIVED_COLUMNS = ('id', 'recipient_username', 'sender_id', 'title', 'message', 'type', 'loan_id',
+                    'is_read', 'timestamp')
+
+
+def _row_to_dict(row):
+    data = dict(row._mapping)
+    if data['timestamp'] is not None:
+        data['timestamp'] = data['timestamp'].isoformat()
+    return data
+
+
+def archived_rows(archive):
+    """The notification rows stored in one NotificationArchive chunk."""
+    return json.loads(zlib.decompress(archive.payload))
+
+
+def archive_read_notifications(retention_days, batch_size=500, keep_types=(), pause=0, on_chunk=None):
+    """Move read notifications older than ``retention_days`` into notification_archive.
+
+    Walks the primary key in chunks of ``batch_size``; each chunk is its own
+    short transaction (one compressed archive row plus a DELETE), with an
+    optional ``pause`` between chunks so request writers get the lock.
+    Notifications whose type is in ``keep_types`` stay in the hot table.
+    Unread notifications are never moved, so the unread counters are
+    unaffected. ``on_chunk(rows moved, seconds)`` is called after each chunk.
+    Returns (rows moved, chunks, seconds).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    criteria = [Notification.is_read == True, Notification.timestamp < cutoff]
+    if keep_types:
+        criteria.append(or_(Notification.type.is_(None), Notification.type.notin_(keep_types)))
+    columns = [getattr(Notification, name) for name in ARCHIVED_COLUMNS]
+
+    moved = chunks = 0
+    last_id = 0
+    started = time.perf_counter()
+    while True:
+        ids = db.session.execute(
+            select(Notification.id).where(Notification.id > last_id, *criteria)
+            .order_by(Notification.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        # The criteria are checked again by the DELETE, and only the rows it
+        # actually removed are archived: one marked unread since the SELECT stays put
+        rows = db.session.execute(
+            delete(Notification).where(Notification.id.in_(ids), *criteria)
+            .returning(*columns)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if rows:
+            rows.sort(key=lambda row: row.id)
+            timestamps = [row.timestamp for row in rows if row.timestamp is not None]
+            db.session.add(NotificationArchive(
+                first_notification_id=rows[0].id,
+                last_notification_id=rows[-1].id,
+                row_count=len(rows),
+                oldest_timestamp=min(timestamps, default=None),
+                newest_timestamp=max(timestamps, default=None),
+                payload=zlib.compress(json.dumps([_row_to_dict(row) for row in rows]).encode())
+            ))
+        db.session.commit()
+
+        moved += len(rows)
+        chunks += 1
+        last_id = ids[-1]
+        if on_chunk:
+            on_chunk(moved, time.perf_counter() - started)
+        if pause:
+            time.sleep(pause)
+
+    return moved, chunks, time.perf_counter() - started
@@ -0,0 +1,245 @@
+import threading
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, update, delete, or_, and_
+from sqlalchemy.orm import Session, object_session
+from models import db, Member, Notification, NotificationOutbox
+
+QUEUED_KEY = "notification_outbox_queued"
+
+
+def create_notification(recipient_username, title, message, type, loan_id=None, sender_id=None, timestamp=None):
+    """Add a notification to the current session right away; the caller commits."""
+    notification = Notification(
+        recipient_username=recipient_username,
+        sender_id=sender_id,
+        title=title,
+        message=message,
+        type=type,
+        loan_id=loan_id,
+        timestamp=timestamp or datetime.utcnow()
+    )
+    db.session.add(notification)
+    return notification
+
+
+def queue_notification(recipient_username, title, message, type, loan_id=None, sender_id=None):
+    """Queue a notification in the caller's transaction; the dispatch worker writes it after commit."""
+    db.session.add(NotificationOutbox(
+        audience='member',
+        recipient_username=recipient_username,
+        sender_id=sender_id,
+        title=title,
+        message=message,
+        type=type,
+        loan_id=loan_id
+    ))
+
+
+def queue_admin_notification(title, message, type, loan_id=None, sender_id=None):
+    """Queue one notification per admin; the worker looks the admins up, not the request."""
+    db.session.add(NotificationOutbox(
+        audience='admins',
+        sender_id=sender_id,
+        title=title,
+        message=message,
+        type=type,
+        loan_id=loan_id
+    ))
+
+
+class EntriesReclaimed(RuntimeError):
+    """Another worker took over the claim on outbox entries we were writing."""
+
+
+class NotificationDispatcher:
+    """Background worker writing queued notifications in batches.
+
+    Views queue notifications in the same transaction as their own writes
+    (the ``notification_outbox`` table), so a crash never loses one and the
+    request does not pay for the fan-out. The worker claims a batch, writes
+    the notifications and deletes the outbox rows in one transaction; if the
+    batch fails, entries are retried one by one and a failing entry backs
+    off exponentially until ``NOTIFICATION_DISPATCH_MAX_ATTEMPTS``, after
+    which it is left as 'failed'. Commits that queue entries wake the worker
+    at once; otherwise it polls every ``NOTIFICATION_DISPATCH_INTERVAL_SECONDS``.
+    Claims older than ``NOTIFICATION_DISPATCH_CLAIM_TIMEOUT`` (a worker died
+    mid-batch) are picked up again.
+    """
+
+    def __init__(self):
+        self.batch_size = 100
+        self.interval = 5
+        self.max_attempts = 5
+        self.claim_timeout = timedelta(minutes=5)
+        self._app = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._started = False
+        self._listening = False
+
+    def init_app(self, app):
+        self.batch_size = app.config.get("NOTIFICATION_DISPATCH_BATCH_SIZE", 100)
+        self.interval = app.config.get("NOTIFICATION_DISPATCH_INTERVAL_SECONDS", 5)
+        self.max_attempts = app.config.get("NOTIFICATION_DISPATCH_MAX_ATTEMPTS", 5)
+        self.claim_timeout = app.config.get("NOTIFICATION_DISPATCH_CLAIM_TIMEOUT", timedelta(minutes=5))
+        self._app = app
+
+        if not self._listening:
+            event.listen(NotificationOutbox, "after_insert", self._mark_queued)
+            event.listen(Session, "after_commit", self._wake_if_queued)
+            event.listen(Session, "after_rollback", self._forget_queued)
+            self._listening = True
+
+        # Started by the first request, so CLI commands (db upgrade etc.) never run it
+        if app.config.get("NOTIFICATION_DISPATCH_WORKER", True):
+            app.before_request(self._ensure_started)
+        app.extensions["notification_dispatcher"] = self
+
+    def _mark_queued(self, mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            session.info[QUEUED_KEY] = True
+
+    def _wake_if_queued(self, session):
+        if session.info.pop(QUEUED_KEY, False):
+            self._wake.set()
+
+    def _forget_queued(self, session):
+        session.info.pop(QUEUED_KEY, None)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="notification-dispatch", daemon=True).start()
+
+    def _run(self):
+        while True:
+            # Cleared first so entries committed during the batch wake the next round
+            self._wake.clear()
+            handled = 0
+            try:
+                with self._app.app_context():
+                    handled = sum(self.dispatch_pending())
+            except Exception as e:
+                print("ERROR during notification dispatch:", e)
+            if handled < self.batch_size:
+                self._wake.wait(self.interval)
+
+    def _claim(self):
+        """Mark up to batch_size due entries as ours and return them."""
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        claimable = or_(
+            and_(NotificationOutbox.status == 'pending', NotificationOutbox.next_attempt_at <= now),
+            and_(NotificationOutbox.status == 'processing', NotificationOutbox.claimed_at < now - self.claim_timeout)
+        )
+        due = select(NotificationOutbox.id).where(claimable)\
+            .order_by(NotificationOutbox.id).limit(self.batch_size)
+
+        db.session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(due), claimable)
+            .values(status='processing', claim_token=token, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        entries = NotificationOutbox.query.filter_by(claim_token=token).order_by(NotificationOutbox.id).all()
+        return token, entries
+
+    def _write(self, entries, token, admin_ids):
+        for entry in entries:
+            if entry.audience == 'admins':
+                if admin_ids is None:
+                    admin_ids = [member_id for (member_id,) in
+                                 db.session.query(Member.id).filter(Member.is_admin == True).all()]
+                recipients = admin_ids
+            else:
+                recipients = [entry.recipient_username]
+
+            for recipient in recipients:
+                create_notification(recipient, entry.title, entry.message, entry.type,
+                                    loan_id=entry.loan_id, sender_id=entry.sender_id, timestamp=entry.created_at)
+
+        db.session.flush()
+
+        # Only entries still claimed by us; another worker may have taken over a stale claim
+        ids = [entry.id for entry in entries]
+        deleted = db.session.execute(
+            delete(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(ids), NotificationOutbox.claim_token == token)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if deleted != len(ids):
+            raise EntriesReclaimed("outbox entries were reclaimed by another worker")
+        return admin_ids
+
+    def _fail(self, entry_id, token, attempts, error):
+        attempts += 1
+        values = {"attempts": attempts, "last_error": str(error), "claim_token": None, "claimed_at": None}
+        if attempts >= self.max_attempts:
+            values["status"] = 'failed'
+        else:
+            values["status"] = 'pending'
+            backoff = min(self.interval * 2 ** attempts, 3600)
+            values["next_attempt_at"] = datetime.utcnow() + timedelta(seconds=backoff)
+
+        db.session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id == entry_id, NotificationOutbox.claim_token == token)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def dispatch_pending(self):
+        """Write one batch of due entries. Returns (entries written, entries failed)."""
+        token, entries = self._claim()
+        if not entries:
+            return 0, 0
+
+        # Plain values: the ORM objects are expired by the rollbacks below
+        claimed = [(entry.id, entry.attempts) for entry in entries]
+        try:
+            self._write(entries, token, None)
+            db.session.commit()
+            return len(entries), 0
+        except Exception:
+            db.session.rollback()
+
+        # Retry one by one so a single bad entry does not hold back the batch
+        written = failed = 0
+        admin_ids = None
+        for entry_id, attempts in claimed:
+            entry = NotificationOutbox.query.filter_by(id=entry_id, claim_token=token).first()
+            if entry is None:
+                continue
+            try:
+                admin_ids = self._write([entry], token, admin_ids)
+                db.session.commit()
+                written += 1
+            except EntriesReclaimed:
+                # Now the other worker's entry to write or fail
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                self._fail(entry_id, token, attempts, e)
+                failed += 1
+
+        return written, failed
+
+    def drain(self):
+        """Dispatch until nothing is due. Returns (entries written, entries failed)."""
+        written = failed = 0
+        while True:
+            batch_written, batch_failed = self.dispatch_pending()
+            if not batch_written and not batch_failed:
+                return written, failed
+            written += batch_written
+            failed += batch_failed
+
+
+notification_dispatcher = NotificationDispatcher()
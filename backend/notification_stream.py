@@ -0,0 +1,239 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models import Notification, BroadcastNotification
+
+PENDING_EVENTS_KEY = "notification_stream_events"
+BROADCAST = "*"
+
+
+class MemoryBackend:
+    """Delivers events inside this process only."""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, event):
+        self._deliver(event)
+
+
+class SQLiteRelayBackend:
+    """Shares events between worker processes on one host through a SQLite file.
+
+    Publishing appends a row; every process polls for rows above the highest
+    id it has seen and delivers them to its own subscribers, so events from
+    any worker reach members connected to any other. Rows older than
+    ``retention_seconds`` are deleted as the relay is polled.
+    """
+
+    def __init__(self, path, poll_interval=0.5, retention_seconds=300):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._high_water_id = 0
+        self._last_prune = 0.0
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def start(self, deliver):
+        self._deliver = deliver
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS notification_events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            # Only events published from now on
+            self._high_water_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM notification_events").fetchone()[0]
+        finally:
+            conn.close()
+
+        threading.Thread(target=self._poll, name="notification-relay", daemon=True).start()
+
+    def publish(self, event):
+        # One connection per process, shared by the request threads under a lock
+        with self._publish_lock:
+            if self._publish_conn is None:
+                self._publish_conn = self._connect(check_same_thread=False)
+            try:
+                self._publish_conn.execute("INSERT INTO notification_events (created_at, payload) VALUES (?, ?)",
+                                           (time.time(), json.dumps(event)))
+            except sqlite3.Error:
+                # Reconnect on the next publish in case the connection itself went bad
+                self._publish_conn.close()
+                self._publish_conn = None
+                raise
+
+    def _poll(self):
+        conn = self._connect()
+        while True:
+            try:
+                rows = conn.execute("SELECT id, payload FROM notification_events WHERE id > ? ORDER BY id",
+                                    (self._high_water_id,)).fetchall()
+                for row_id, payload in rows:
+                    self._deliver(json.loads(payload))
+                    self._high_water_id = row_id
+
+                if time.monotonic() - self._last_prune >= self.retention_seconds:
+                    conn.execute("DELETE FROM notification_events WHERE created_at < ?",
+                                 (time.time() - self.retention_seconds,))
+                    self._last_prune = time.monotonic()
+            except sqlite3.Error:
+                pass  # relay busy or briefly unavailable; try again next round
+            time.sleep(self.poll_interval)
+
+
+class Subscription:
+    """One connected stream: a bounded queue of events for a member."""
+
+    def __init__(self, member_id, max_pending):
+        self.member_id = str(member_id)
+        self.events = queue.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # A client this far behind should refetch /notifications instead
+            self.overflowed = True
+
+    def get(self, timeout):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class NotificationHub:
+    """Pub/sub of new notifications for ``GET /notifications/stream``.
+
+    Notification and broadcast inserts are queued on the session and
+    published once it commits (dropped on rollback), so streams never see
+    rows that were rolled back. Events go through a backend: in-process by
+    default, or a SQLite relay (``NOTIFICATION_STREAM_BACKEND = "sqlite"``)
+    when several workers serve the app. The backend starts on first use.
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # member id (str) -> set of Subscription
+        self._lock = threading.Lock()
+        self._listening = False
+        self._started = False
+        self.backend = None
+        self.keepalive_seconds = 15
+        self.max_pending = 100
+
+    def init_app(self, app, backend=None):
+        self.keepalive_seconds = app.config.get("NOTIFICATION_STREAM_KEEPALIVE_SECONDS", 15)
+        self.max_pending = app.config.get("NOTIFICATION_STREAM_MAX_PENDING", 100)
+
+        if backend is None:
+            if app.config.get("NOTIFICATION_STREAM_BACKEND", "memory") == "sqlite":
+                path = app.config.get("NOTIFICATION_STREAM_RELAY_PATH") or \
+                    os.path.join(app.instance_path, "notification_events.sqlite")
+                backend = SQLiteRelayBackend(path, app.config.get("NOTIFICATION_STREAM_POLL_SECONDS", 0.5))
+            else:
+                backend = MemoryBackend()
+        self.backend = backend
+
+        if not self._listening:
+            event.listen(Notification, "after_insert", self._queue_notification)
+            event.listen(BroadcastNotification, "after_insert", self._queue_broadcast)
+            event.listen(Session, "after_commit", self._publish_pending)
+            event.listen(Session, "after_rollback", self._drop_pending)
+            self._listening = True
+
+        app.extensions["notification_hub"] = self
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.backend.start(self._deliver)
+
+    def publish(self, recipient, payload, exclude=None):
+        """Send ``payload`` to ``recipient``'s streams (BROADCAST for everyone but ``exclude``)."""
+        if self.backend is None:
+            return
+        self._ensure_started()
+        self.backend.publish({
+            "recipient": str(recipient),
+            "exclude": str(exclude) if exclude is not None else None,
+            "payload": payload
+        })
+
+    def _deliver(self, event):
+        with self._lock:
+            if event["recipient"] == BROADCAST:
+                targets = [s for member_id, subs in self._subscribers.items()
+                           if member_id != event["exclude"] for s in subs]
+            else:
+                targets = list(self._subscribers.get(event["recipient"], ()))
+        for subscription in targets:
+            subscription.put(event["payload"])
+
+    def subscribe(self, member_id):
+        self._ensure_started()
+        subscription = Subscription(member_id, self.max_pending)
+        with self._lock:
+            self._subscribers.setdefault(subscription.member_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.member_id)
+            if subs:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.member_id]
+
+    def _queue(self, target, event):
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(PENDING_EVENTS_KEY, []).append(event)
+
+    def _queue_notification(self, mapper, connection, target):
+        self._queue(target, (target.recipient_username, _payload(target, "direct"), None))
+
+    def _queue_broadcast(self, mapper, connection, target):
+        self._queue(target, (BROADCAST, _payload(target, "broadcast"), target.sender_id))
+
+    def _publish_pending(self, session):
+        # Runs after the commit: a relay failure must not surface as a failed request
+        for recipient, payload, exclude in session.info.pop(PENDING_EVENTS_KEY, []):
+            try:
+                self.publish(recipient, payload, exclude)
+            except Exception as e:
+                print("ERROR during notification publish:", e)
+
+    def _drop_pending(self, session):
+        session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+def _payload(notification, source):
+    return {
+        "id": notification.id,
+        "source": source,
+        "title": notification.title,
+        "message": notification.message,
+        "type": notification.type,
+        "loan_id": notification.loan_id,
+        "sender_id": notification.sender_id,
+        "timestamp": notification.timestamp.isoformat() if notification.timestamp else None
+    }
+
+
+notification_hub = NotificationHub()
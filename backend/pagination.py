@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import or_, and_
+
+# Same ceiling Flask-SQLAlchemy's paginate() applies
+MAX_PER_PAGE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def wants_cursor():
+    """Cursor mode is on whenever ?cursor= is present, even empty (first page)."""
+    return 'cursor' in request.args
+
+
+def keyset_page(query, sort_column, id_column, per_page):
+    """One page of ``query`` newest first, seeking past ``?cursor=`` instead of using OFFSET.
+
+    Rows are ordered by ``(sort_column, id_column)`` descending and the cursor
+    is the last row's pair, so each page is an index range scan however deep
+    it is. The COUNT(*) total only runs with ``?with_total=true``.
+    ``per_page`` is clamped to 1..MAX_PER_PAGE.
+    Returns ``(items, meta)``; raises InvalidCursor for a malformed cursor.
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    cursor = request.args.get('cursor')
+    seek = decode_cursor(cursor) if cursor else None
+
+    meta = {"per_page": per_page}
+    if request.args.get('with_total', '').lower() == 'true':
+        meta["total"] = query.order_by(None).count()
+
+    if seek:
+        sort_value, row_id = seek
+        query = query.filter(or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id)
+        ))
+
+    # One extra row tells whether another page exists
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    meta["next_cursor"] = None
+    if len(rows) > per_page:
+        last = items[-1]
+        meta["next_cursor"] = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return items, meta
@@ -0,0 +1,165 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# (thread id, statement log) of the request running in this context. Background
+# threads (notification dispatch, upload jobs) have their own context, and the
+# thread id guards against contexts copied into another thread.
+_request_log = ContextVar("query_stats_request_log", default=None)
+# (thread id, finished requests) collected by an active query_budget block
+_budget_requests = ContextVar("query_stats_budget_requests", default=None)
+
+
+class QueryStats:
+    """Counts SQL statements and database time per request.
+
+    Cursor events are recorded in a context variable owned by the request's
+    thread (so statements from background threads are never counted) and folded
+    into per-endpoint totals when it finishes. In debug mode (or with
+    ``QUERY_STATS_HEADERS``) every response carries ``X-Query-Count`` and
+    ``X-Query-Time-Ms``.
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+        self.slow_ms = 100
+        self.keep_slowest = 5
+        self._lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app):
+        self.slow_ms = app.config.get("QUERY_STATS_SLOW_MS", 100)
+        self.keep_slowest = app.config.get("QUERY_STATS_KEEP_SLOWEST", 5)
+
+        if not self._listening:
+            # Listen on every engine so the counts do not depend on when
+            # Flask-SQLAlchemy creates its engine
+            event.listen(Engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", self._after_cursor_execute)
+            self._listening = True
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._end_request)
+        app.extensions["query_stats"] = self
+
+    def _current_log(self):
+        owner = _request_log.get()
+        if owner is not None and owner[0] == threading.get_ident():
+            return owner[1]
+        return None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._current_log() is not None:
+            context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        log = self._current_log()
+        if log is None:
+            return
+        started = getattr(context, "_query_started", None)
+        if started is not None:
+            log.append((statement, (time.perf_counter() - started) * 1000))
+
+    def _start_request(self):
+        _request_log.set((threading.get_ident(), []))
+
+    def _finish_request(self, response):
+        log = self._current_log()
+        _request_log.set(None)
+        if log is None:
+            return response
+
+        count = len(log)
+        total_ms = sum(ms for _, ms in log)
+        if current_app.config.get("QUERY_STATS_HEADERS", current_app.debug):
+            response.headers["X-Query-Count"] = str(count)
+            response.headers["X-Query-Time-Ms"] = f"{total_ms:.2f}"
+
+        endpoint = request.endpoint or request.path
+        budget = _budget_requests.get()
+        if budget is not None and budget[0] == threading.get_ident():
+            budget[1].append((endpoint, [statement for statement, _ in log]))
+
+        self._record(endpoint, count, total_ms, log)
+        return response
+
+    def _end_request(self, exc=None):
+        # Requests that fail before after_request must not leave a log behind
+        _request_log.set(None)
+
+    def _record(self, endpoint, count, total_ms, log):
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, {
+                "requests": 0,
+                "queries": 0,
+                "max_queries": 0,
+                "db_time_ms": 0.0,
+                "slowest": [],
+            })
+            stats["requests"] += 1
+            stats["queries"] += count
+            stats["max_queries"] = max(stats["max_queries"], count)
+            stats["db_time_ms"] += total_ms
+
+            slow = [{"statement": s, "ms": round(ms, 2)} for s, ms in log if ms >= self.slow_ms]
+            if slow:
+                stats["slowest"] = sorted(stats["slowest"] + slow, key=lambda q: q["ms"], reverse=True)
+                del stats["slowest"][self.keep_slowest:]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    "requests": s["requests"],
+                    "queries": s["queries"],
+                    "avg_queries": round(s["queries"] / s["requests"], 2),
+                    "max_queries": s["max_queries"],
+                    "db_time_ms": round(s["db_time_ms"], 2),
+                    "avg_db_time_ms": round(s["db_time_ms"] / s["requests"], 2),
+                    "slowest": list(s["slowest"]),
+                }
+                for endpoint, s in self.endpoints.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+
+
+query_stats = QueryStats()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail if a request handled inside the block runs more than ``max_queries`` statements.
+
+        with query_budget(3):
+            client.get("/admin/notifications", headers=headers)
+
+    Counts come from each request's own statement log, so statements of other
+    threads' requests or of background workers never count against the budget.
+    The app must have ``query_stats`` initialised. Yields the list of
+    (endpoint, statements) of the requests seen.
+    """
+    requests = []
+    token = _budget_requests.set((threading.get_ident(), requests))
+    try:
+        yield requests
+    finally:
+        _budget_requests.reset(token)
+
+    over = [(endpoint, statements) for endpoint, statements in requests if len(statements) > max_queries]
+    if over:
+        raise QueryBudgetExceeded("\n".join(
+            f"{endpoint}: {len(statements)} queries issued, budget is {max_queries}:\n" + "\n".join(statements)
+            for endpoint, statements in over
+        ))
@@ -0,0 +1,37 @@
+from sqlalchemy import func, select
+from models import db, Member, Notification
+
+
+def _expected_unread():
+    """Per-member unread direct notifications, correlated to ``members``.
+
+    Broadcasts are not part of the counter; they are counted when read.
+    """
+    return select(func.count()).select_from(Notification).where(
+        Notification.recipient_username == Member.id,
+        Notification.is_read == False
+    ).scalar_subquery()
+
+
+def recompute_unread_counts():
+    """Reset every drifted unread counter from the notification rows. Returns the number of members changed."""
+    expected = _expected_unread()
+    changed = db.session.execute(
+        Member.__table__.update()
+        .where(Member.unread_notifications != expected)
+        .values(unread_notifications=expected)
+    ).rowcount
+    db.session.commit()
+    return changed
+
+
+def check_unread_counts():
+    """Members whose stored unread counter disagrees with their notification rows."""
+    expected = _expected_unread()
+    rows = db.session.execute(
+        select(Member.id, Member.unread_notifications, expected.label('expected'))
+        .where(Member.unread_notifications != expected)
+        .order_by(Member.id)
+    ).all()
+
+    return [{"member_id": member_id, "stored": stored, "expected": count} for member_id, stored, count in rows]
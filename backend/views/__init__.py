@@ -13,4 +13,5 @@ from .admin import *
 from .upload import *
 from .extract import *
 from .summary import *
-from .interest import *
\ No newline at end of file
+from .interest import *
+from .statement import *
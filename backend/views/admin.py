@@ -1,40 +1,29 @@
-from models import Account,db, Member, Transaction,LoanRepayment, Loan,Notification
+from models import Account,db, Member, Transaction,LoanRepayment, Loan,Notification, BroadcastNotification
 from flask import jsonify,request, Blueprint
 from werkzeug.security import generate_password_hash
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import request
 from decorator import admin_required
+from querystats import query_stats
+from idempotency import idempotent
+from pagination import wants_cursor, keyset_page, InvalidCursor
+from notification_service import create_notification, queue_notification
 from datetime import datetime
-from sqlalchemy import desc 
+from sqlalchemy import desc
+from sqlalchemy.orm import selectinload, contains_eager
+from collections import defaultdict
 
 admin_bp = Blueprint("admin_bp", __name__)
 
 
-
-def create_notification(recipient_username, message, type, loan_id=None, sender_id=None):
-    notif = Notification(
-        recipient_username=recipient_username,
-        sender_id=sender_id,
-        message=message,
-        type=type,
-        loan_id=loan_id,
-        timestamp=datetime.utcnow()
-    )
-    db.session.add(notif)
-    db.session.commit()
-
-
-
 @admin_bp.route('/approve/<int:loan_id>', methods=['PATCH'])
 @jwt_required()
 @admin_required
+@idempotent
 def approve_loan(loan_id):
     
-    # Verify admin privileges
+    # Admin privileges are checked by @admin_required
     current_user_id = get_jwt_identity()
-    admin = Member.query.get(current_user_id)
-    if not admin or not admin.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
 
     # Get loan and validate status
     loan = Loan.query.get_or_404(loan_id)
@@ -47,15 +36,22 @@ def approve_loan(loan_id):
     if action not in ['approve', 'reject']:
         return jsonify({"error": "Invalid action. Use 'approve' or 'reject'"}), 400
 
-    # Process approval/rejection
     if action == 'approve':
-        loan.status = 'approved'
-        loan.approval_date = datetime.utcnow()
-        loan.approved_by = admin.id  
-
         member_account = Account.query.filter_by(member_id=loan.member_id).first()
         if not member_account:
             return jsonify({"error": "Member account not found"}), 404
+        moved = loan.change_status('pending', 'approved', approval_date=datetime.utcnow())
+    else:
+        moved = loan.change_status('pending', 'rejected')
+
+    # Another request approved or rejected the loan since we read it
+    if not moved:
+        db.session.rollback()
+        return jsonify({"error": "Loan has already been processed"}), 409
+
+    # Process approval/rejection
+    if action == 'approve':
+        loan.approved_by = current_user_id
 
         member_account.deposit(float(loan.amount))
 
@@ -74,20 +70,18 @@ def approve_loan(loan_id):
             f"Term_months: {loan.term_months}"
         )
     else:
-        loan.status = 'rejected'
         notification_message = (
             f"Your loan application of {loan.amount} has been rejected.\n"
             f"Reason: {data.get('reason', 'Not specified')}"
         )
 
-    notification = Notification(
-        recipient_username = loan.borrower.username,
+    queue_notification(
+        loan.borrower.username,
         title=f"Loan {action.title()}",
         message=notification_message,
         type=f"loan_{action}",
         loan_id=loan.id
     )
-    db.session.add(notification)
 
     try:
         db.session.commit()
@@ -105,13 +99,6 @@ def approve_loan(loan_id):
 @jwt_required()
 @admin_required
 def manage_repayment(repayment_id):
-    # Admin verification
-    current_user_id = get_jwt_identity()
-    current_user = Member.query.get(current_user_id)
-    if not current_user or not current_user.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-
-
     repayment = LoanRepayment.query.get_or_404(repayment_id)
     loan = repayment.loan
 
@@ -133,13 +120,12 @@ def manage_repayment(repayment_id):
 
     elif request.method == 'DELETE':
         # Recalculate loan status
+        total_repaid, _ = loan.remove_repayment(repayment)
         db.session.delete(repayment)
-        
-        # Check if loan status needs to be reverted
-        if loan.status == 'paid':
-            total_repaid = sum(r.amount for r in loan.repayments if r.id != repayment_id)
-            if total_repaid < (loan.amount * (1 + loan.interest_rate/100)):
-                loan.status = 'approved'
+
+        # Check if loan status needs to be reverted, judged from the updated row
+        if total_repaid < loan.total_due:
+            loan.change_status('paid', 'approved')
         
         try:
             db.session.commit()
@@ -156,26 +142,21 @@ def manage_repayment(repayment_id):
 def send_notification():
     """Send a notification to a specific member (admin only)"""
     current_user_id = get_jwt_identity()
-    admin = Member.query.get(current_user_id)
-    
-    if not admin or not admin.is_admin:
-        return jsonify({"error": "Admin access required"}), 403
 
     data = request.get_json()
     required_fields = ['recipient_username', 'title', 'message', 'type']
     if not all(field in data for field in required_fields):
         return jsonify({"error": f"Missing required fields: {', '.join(required_fields)}"}), 400
 
-    notification = Notification(
-        recipient_username=data['recipient_username'],
-        sender_id=current_user_id,
+    # Written directly: the response carries the new notification's id
+    notification = create_notification(
+        data['recipient_username'],
         title=data['title'],
         message=data['message'],
         type=data['type'],
-        loan_id=data.get('loan_id')
+        loan_id=data.get('loan_id'),
+        sender_id=current_user_id
     )
-
-    db.session.add(notification)
     db.session.commit()
 
     return jsonify({
@@ -192,34 +173,26 @@ def send_notification():
 def broadcast_notification():
     """Broadcast notification to all members (admin only)"""
     current_user_id = get_jwt_identity()
-    admin = Member.query.get(current_user_id)
-    
-    if not admin or not admin.is_admin:
-        return jsonify({"error": "Admin access required"}), 403
 
     data = request.get_json()
     required_fields = ['title', 'message', 'type']
     if not all(field in data for field in required_fields):
         return jsonify({"error": f"Missing required fields: {', '.join(required_fields)}"}), 400
 
-    members = Member.query.filter(Member.id != current_user_id).all()
-    notifications = []
-    
-    for member in members:
-        notifications.append(Notification(
-            recipient_username=member.id,
-            sender_id=current_user_id,
-            title=data['title'],
-            message=data['message'],
-            type=data['type'],
-            loan_id=data.get('loan_id')
-        ))
-
-    db.session.bulk_save_objects(notifications)
+    # One row for everyone; members see it through their notification reads
+    db.session.add(BroadcastNotification(
+        sender_id=current_user_id,
+        title=data['title'],
+        message=data['message'],
+        type=data['type'],
+        loan_id=data.get('loan_id')
+    ))
     db.session.commit()
 
+    recipients = Member.query.filter(Member.id != current_user_id).count()
+
     return jsonify({
-        "success": f"Notification broadcasted to {len(members)} members"
+        "success": f"Notification broadcasted to {recipients} members"
     }), 201
 
 
@@ -228,12 +201,6 @@ def broadcast_notification():
 @admin_required
 def get_admin_notifications():
     """Get notifications meant for admins only"""
-    # Verify admin privileges
-    current_user_id = get_jwt_identity()
-    admin = Member.query.get(current_user_id)
-    if not admin or not admin.is_admin:
-        return jsonify({"error": "Admin privileges required"}), 403
-
     # Pagination and filtering
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
@@ -244,7 +211,10 @@ def get_admin_notifications():
 
     # Base query: Only notifications where recipient is an admin
     query = Notification.query.join(Member, Notification.recipient_username == Member.id)\
-                              .filter(Member.is_admin == True)
+                              .filter(Member.is_admin == True)\
+                              .options(contains_eager(Notification.recipient),
+                                       selectinload(Notification.loan),
+                                       selectinload(Notification.sender))
 
     # Apply filters
     if notification_type:
@@ -267,9 +237,29 @@ def get_admin_notifications():
         except ValueError:
             return jsonify({"error": "Invalid end_date format (use ISO format)"}), 400
 
-    # Execute query
-    notifications = query.order_by(desc(Notification.timestamp))\
-                       .paginate(page=page, per_page=per_page, error_out=False)
+    filters = {
+        "type": notification_type,
+        "is_read": is_read,
+        "start_date": start_date,
+        "end_date": end_date
+    }
+
+    # Execute query; ?cursor= seeks on (timestamp, id) instead of OFFSET + COUNT(*)
+    if wants_cursor():
+        try:
+            items, meta = keyset_page(query, Notification.timestamp, Notification.id, per_page)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        notifications = query.order_by(desc(Notification.timestamp))\
+                           .paginate(page=page, per_page=per_page, error_out=False)
+        items = notifications.items
+        meta = {
+            "total": notifications.total,
+            "pages": notifications.pages,
+            "current_page": notifications.page
+        }
+    meta["filters"] = filters
 
     # Build response
     return jsonify({
@@ -292,18 +282,8 @@ def get_admin_notifications():
                 "username": n.sender.username,
                 "name": f"{n.sender.first_name} {n.sender.last_name}"
             } if n.sender else None
-        } for n in notifications.items],
-        "meta": {
-            "total": notifications.total,
-            "pages": notifications.pages,
-            "current_page": notifications.page,
-            "filters": {
-                "type": notification_type,
-                "is_read": is_read,
-                "start_date": start_date,
-                "end_date": end_date
-            }
-        }
+        } for n in items],
+        "meta": meta
     })
 
 
@@ -317,40 +297,53 @@ def get_loans_with_repayments():
     # Filters from query params
     status_filter = request.args.get('status')
     member_username_filter = request.args.get('member_username')
+    # Summary views can skip the per-repayment arrays
+    include_repayments = request.args.get('include_repayments', 'true').lower() != 'false'
 
     # Pagination params
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    # Base query
-    query = Loan.query
+    # Base query: each loan with its member's username
+    query = Loan.query\
+        .outerjoin(Member, Member.id == Loan.member_id)\
+        .add_columns(Member.username)
 
     # Apply filters
     if status_filter:
         query = query.filter(Loan.status == status_filter)
     if member_username_filter:
-        query = query.join(Member).filter(Member.username.ilike(f"%{member_username_filter}%"))
+        query = query.filter(Member.username.ilike(f"%{member_username_filter}%"))
 
     # Paginate
     loans_pagination = query.order_by(Loan.application_date.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    loans = loans_pagination.items
+    rows = loans_pagination.items
+
+    # Repayment details for the whole page in one query
+    repayments_by_loan = defaultdict(list)
+    if include_repayments and rows:
+        repayments = LoanRepayment.query\
+            .filter(LoanRepayment.loan_id.in_([loan.id for loan, _ in rows]))\
+            .order_by(LoanRepayment.id).all()
+        for r in repayments:
+            repayments_by_loan[r.loan_id].append({
+                "repayment_id": r.id,
+                "amount": float(r.amount),
+                "payment_date": r.payment_date.isoformat() if r.payment_date else None,
+                "payment_method": r.payment_method
+            })
 
     result = []
-    for loan in loans:
-        # Manually access the member's username
-        member = Member.query.get(loan.member_id)
-        member_username = member.username if member else "Unknown"
-
-        # Calculate totals
+    for loan, member_username in rows:
+        # Totals are kept on the loan as repayments are recorded
         loan_amount = float(loan.amount)
-        interest = loan_amount * (float(loan.interest_rate) / 100)
-        total_due = loan_amount + interest
-        total_repaid = sum(float(r.amount) for r in loan.repayments)
+        total_due = float(loan.total_due)
+        total_repaid = float(loan.total_repaid)
         remaining_balance = max(total_due - total_repaid, 0)
 
-        result.append({
+        entry = {
             "loan_id": loan.id,
-            "member_username": member_username,
+            "member_username": member_username or "Unknown",
             "original_amount": loan_amount,
             "interest_rate": float(loan.interest_rate),
             "term_months": loan.term_months,
@@ -360,14 +353,11 @@ def get_loans_with_repayments():
             "approval_date": loan.approval_date.isoformat() if loan.approval_date else None,
             "total_due": round(total_due, 2),
             "total_repaid": round(total_repaid, 2),
-            "remaining_balance": round(remaining_balance, 2),
-            "repayments": [{
-                "repayment_id": r.id,
-                "amount": float(r.amount),
-                "payment_date": r.payment_date.isoformat() if r.payment_date else None,
-                "payment_method": r.payment_method
-            } for r in loan.repayments]
-        })
+            "remaining_balance": round(remaining_balance, 2)
+        }
+        if include_repayments:
+            entry["repayments"] = repayments_by_loan[loan.id]
+        result.append(entry)
 
     return jsonify({
         "loans": result,
@@ -378,7 +368,8 @@ def get_loans_with_repayments():
             "per_page": per_page,
             "filters": {
                 "status": status_filter,
-                "member_username": member_username_filter
+                "member_username": member_username_filter,
+                "include_repayments": include_repayments
             }
         }
     })
@@ -393,10 +384,23 @@ def get_all_members():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    pagination = Member.query.paginate(page=page, per_page=per_page, error_out=False)
+    # ?cursor= seeks on (join_date, id) instead of OFFSET + COUNT(*)
+    if wants_cursor():
+        try:
+            items, meta = keyset_page(Member.query, Member.join_date, Member.id, per_page)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        pagination = Member.query.paginate(page=page, per_page=per_page, error_out=False)
+        items = pagination.items
+        meta = {
+            'total': pagination.total,
+            'pages': pagination.pages,
+            'current_page': pagination.page
+        }
     members = []
 
-    for member in pagination.items:
+    for member in items:
         account = member.account  # Access the related account
         members.append({
             'id': member.id,
@@ -412,7 +416,32 @@ def get_all_members():
 
     return jsonify({
         'members': members,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': pagination.page
-    }), 200
\ No newline at end of file
+        **meta
+    }), 200
+
+
+
+# SQL statements issued per endpoint since startup
+@admin_bp.route('/admin/metrics/queries', methods=['GET', 'DELETE'])
+@jwt_required()
+@admin_required
+def query_metrics():
+    if request.method == 'DELETE':
+        query_stats.reset()
+        return jsonify({"message": "Query metrics reset"}), 200
+
+    endpoints = query_stats.snapshot()
+    sort = request.args.get('sort', 'avg_queries')
+    if sort not in ('avg_queries', 'max_queries', 'queries', 'avg_db_time_ms', 'db_time_ms', 'requests'):
+        return jsonify({"error": "Invalid sort field"}), 400
+
+    return jsonify({
+        "endpoints": [
+            {"endpoint": name, **stats}
+            for name, stats in sorted(endpoints.items(), key=lambda item: item[1][sort], reverse=True)
+        ],
+        "meta": {
+            "slow_query_ms": query_stats.slow_ms,
+            "sort": sort
+        }
+    }), 200
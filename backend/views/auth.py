@@ -1,4 +1,6 @@
 from models import Member,db, TokenBlocklist
+from blocklist import revoked_tokens
+from decorator import get_current_member, role_claims
 from flask import jsonify,request, Blueprint
 from werkzeug.security import check_password_hash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
@@ -20,7 +22,7 @@ def login():
     member = Member.query.filter_by(email=email).first()
 
     if member and check_password_hash(member.password, password):
-        access_token = create_access_token(identity=member.id)
+        access_token = create_access_token(identity=member.id, additional_claims=role_claims(member))
         return jsonify({
             "access_token": access_token,
             "is_admin": member.is_admin
@@ -33,8 +35,7 @@ def login():
 @auth_bp.route("/current_user", methods=["GET"])
 @jwt_required()
 def current_user():
-    current_user_id = get_jwt_identity()
-    member = Member.query.get(current_user_id)
+    member = get_current_member()
     member_data ={
             'id':member.id,
             'email':member.email,
@@ -49,8 +50,11 @@ def current_user():
 @auth_bp.route("/logout", methods=["DELETE"])
 @jwt_required()
 def logout():
-    jti = get_jwt()["jti"]
+    token = get_jwt()
+    jti = token["jti"]
     now = datetime.now(timezone.utc)
-    db.session.add(TokenBlocklist(jti=jti, created_at=now))
+    expires_at = datetime.utcfromtimestamp(token["exp"]) if "exp" in token else None
+    db.session.add(TokenBlocklist(jti=jti, created_at=now, expires_at=expires_at))
     db.session.commit()
+    revoked_tokens.add(jti, expires_at)
     return jsonify({"success":"Logged out successfully"})
\ No newline at end of file
@@ -8,6 +8,8 @@ import re
 import fitz
 from collections import defaultdict
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from blobstore import get_blob_store, map_file
 
 extract_bp = Blueprint("extract_bp", __name__)
 
@@ -24,6 +26,67 @@ KNOWN_MPESA_PROPERTIES = [
 ]
 
 
+class StatementDocument:
+    """An uploaded statement opened (and decrypted) once.
+
+    Holds the parsed ``fitz.Document`` and caches page text/blocks so every
+    extractor below can share the same parse instead of re-opening the bytes.
+    """
+
+    def __init__(self, pdf_bytes, password=None, path=None):
+        self.pdf_bytes = pdf_bytes
+        self.password = password
+        self.path = path  # file the bytes are mapped from, if any
+        self.doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+        if self.doc.is_encrypted:
+            if not password or not self.doc.authenticate(password):
+                self.doc.close()
+                raise Exception("PDF decryption failed")
+
+        self._page_text = {}
+        self._page_blocks = {}
+
+    def __len__(self):
+        return len(self.doc)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def page_text(self, index):
+        if index < 0:
+            index += len(self.doc)
+        if index not in self._page_text:
+            self._page_text[index] = self.doc[index].get_text()
+        return self._page_text[index]
+
+    def page_blocks(self, index):
+        if index < 0:
+            index += len(self.doc)
+        if index not in self._page_blocks:
+            self._page_blocks[index] = self.doc[index].get_text("blocks")
+        return self._page_blocks[index]
+
+    def close(self):
+        self.doc.close()
+
+
+def open_statement(source, password=None):
+    # Extractors accept either raw bytes or an already opened statement
+    if isinstance(source, StatementDocument):
+        return source
+    return StatementDocument(source, password)
+
+
+def open_stored_statement(pdf_doc, password=None):
+    # Parse a previously uploaded PdfDocument straight from its mapped blob
+    store = get_blob_store()
+    return StatementDocument(store.open(pdf_doc.storage_key), password,
+                             path=store.local_path(pdf_doc.storage_key))
+
+
 def calculate_duration_months(period_str):
     if " - " in period_str:
         parts = [p.strip() for p in period_str.split(" - ")]
@@ -42,14 +105,10 @@ def calculate_duration_months(period_str):
     return 0
 
 
-def extract_metadata(pdf_bytes, password=None):
-    doc = fitz.open(stream=pdf_bytes, filetype='pdf')
-    if doc.is_encrypted:
-        if not password or not doc.authenticate(password):
-            raise Exception("PDF decryption failed")
+def extract_metadata(pdf, password=None):
+    statement = open_statement(pdf, password)
 
-    first_page_text = doc[0].get_text()
-    last_page_text = doc[-1].get_text()
+    first_page_text = statement.page_text(0)
 
     # Extract metadata
     name_match = re.search(r"Customer Name\s*:\s*(.*)", first_page_text)
@@ -86,14 +145,10 @@ def clean_amount(value):
 
 
 
-def extract_summary_table(pdf_bytes, password=None):
-    doc = fitz.open(stream=pdf_bytes, filetype='pdf')
-    if doc.is_encrypted:
-        if not password or not doc.authenticate(password):
-            raise Exception("PDF decryption failed")
+def extract_summary_table(pdf, password=None):
+    statement = open_statement(pdf, password)
 
-    page = doc[0]  # Only check page 1
-    blocks = page.get_text("blocks")
+    blocks = statement.page_blocks(0)  # Only check page 1
     summary_data = []
 
     header_y = None
@@ -139,81 +194,217 @@ def extract_summary_table(pdf_bytes, password=None):
     return summary_result
 
 
-def extract_transactions(pdf_bytes, password=None):
-    doc = fitz.open(stream=pdf_bytes, filetype='pdf')
+# Column headings repeated at the top of every continuation page
+TABLE_HEADER_LINES = {
+    "receipt no", "receipt no.", "completion time", "details",
+    "transaction status", "paid in", "withdrawn", "balance",
+}
 
-    if doc.is_encrypted:
-        if not password or not doc.authenticate(password):
-            raise Exception("PDF decryption failed")
+# A receipt spans at most: receipt no, completion time, up to 7 detail/status
+# lines, amount and balance. Parallel chunks read this far into the next chunk.
+TRANSACTION_LOOKAHEAD_LINES = 16
 
-    transactions = []
-    status_keywords = r"^(Completed|Failed|Pending)$"
-    receipt_no_pattern = r"^[A-Z0-9]{10,}$"  # Covers receipt numbers like TFP39YYAD3, not just TF
-
-    for page in doc:
-        lines = page.get_text().split('\n')
-        i = 0
-        while i < len(lines):
-            # Match receipt number
-            if re.match(receipt_no_pattern, lines[i].strip()):
-                receipt_no = lines[i].strip()
-                i += 1
-                if i >= len(lines): break
+_extraction_pool = None
+_extraction_pool_size = 0
+
+
+def statement_lines(statement, page_start=0, page_stop=None):
+    """Text lines of pages [page_start, page_stop) as one continuous stream."""
+    if page_stop is None:
+        page_stop = len(statement)
+
+    lines = []
+    for page_index in range(page_start, page_stop):
+        page_lines = statement.page_text(page_index).split('\n')
+        if page_lines and page_lines[-1] == "":
+            page_lines.pop()
+
+        # Skip the repeated table header so a receipt that straddles the page
+        # break stitches back together
+        if page_index > 0:
+            k = 0
+            while k < len(page_lines) and page_lines[k].strip().lower() in TABLE_HEADER_LINES:
+                k += 1
+            page_lines = page_lines[k:]
 
-                completion_time = lines[i].strip()
+        lines.extend(page_lines)
+    return lines
+
+
+# Compiled once; parse_transaction_lines runs these on every statement line
+RECEIPT_NO_RE = re.compile(r"^[A-Z0-9]{10,}$")  # Covers receipt numbers like TFP39YYAD3, not just TF
+STATUS_KEYWORDS = frozenset(["Completed", "Failed", "Pending"])
+AMOUNT_RE = re.compile(r"^-?[\d,]+(\.\d{1,2})?$")
+COMPLETION_TIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}(:\d{2})?$")
+
+# Details wrap over at most this many lines before the status column
+MAX_DETAIL_LINES = 6
+
+
+def parse_transaction_lines(lines, start=0, stop=None, sync=None):
+    """Parse receipts whose first line falls in lines[start:stop].
+
+    Single pass over the lines: receipt no -> completion time -> details
+    until a status keyword -> up to two amount cells. Returns
+    ``(entries, resume)``: ``entries`` is a list of ``(line_index,
+    transaction)`` and ``resume`` is where parsing continues after the last
+    receipt. Parsing stops early at any position in ``sync``.
+    """
+    if stop is None:
+        stop = len(lines)
+
+    n = len(lines)
+    entries = []
+    receipt_match = RECEIPT_NO_RE.match
+    amount_match = AMOUNT_RE.match
+    time_match = COMPLETION_TIME_RE.match
+
+    i = start
+    while i < stop:
+        if sync and i in sync:
+            break
+
+        receipt_no = lines[i].strip()
+        if not receipt_match(receipt_no):
+            i += 1
+            continue
+
+        start_index = i
+        if i + 2 >= n:
+            i = n
+            break
+
+        completion_time = lines[i + 1].strip()
+        i += 2
+
+        # Details run until the status keyword; a new receipt (receipt no
+        # followed by a timestamp) means this one has no status
+        details = []
+        transaction_status = None
+        while i < n and len(details) <= MAX_DETAIL_LINES:
+            text = lines[i].strip()
+            if text in STATUS_KEYWORDS:
+                transaction_status = text
                 i += 1
-                if i >= len(lines): break
-
-                # Look ahead for transaction status
-                details_lines = []
-                status_line_index = None
-                for j in range(i, min(i + 7, len(lines))):
-                    if re.match(status_keywords, lines[j].strip()):
-                        status_line_index = j
-                        break
-
-                if status_line_index is None:
-                    i += 1
-                    continue
-
-                details_lines = lines[i:status_line_index]
-                details = "\n".join([d.strip() for d in details_lines])
-                transaction_status = lines[status_line_index].strip()
-                i = status_line_index + 1
-
-                # Extract amount and balance
-                monetary_fields = []
-                while i < len(lines) and len(monetary_fields) < 2:
-                    line = lines[i].strip()
-                    if re.match(r'^-?[\d,]+(\.\d{1,2})?$', line) or line in ["", "-"]:
-                        monetary_fields.append(line)
-                        i += 1
-                    else:
-                        break
-
-                amount = clean_amount(monetary_fields[0]) if len(monetary_fields) > 0 else 0.0
-                balance = clean_amount(monetary_fields[1]) if len(monetary_fields) > 1 else 0.0
-
-                paid_in = amount if amount > 0 else 0.0
-                withdrawn = amount if amount < 0 else 0.0
-                transactions.append({
-                    "receipt_no": receipt_no,
-                    "completion_time": completion_time,
-                    "details": details,
-                    "transaction_status": transaction_status,
-                    "paid_in": paid_in,
-                    "withdrawn": withdrawn,
-                    "balance": balance
-                })
+                break
+            if receipt_match(text) and i + 1 < n and time_match(lines[i + 1].strip()):
+                break
+            details.append(text)
+            i += 1
+
+        if transaction_status is None or len(details) > MAX_DETAIL_LINES:
+            # Not a complete receipt; rescan from the line after its timestamp
+            i = start_index + 2
+            continue
 
-            else:
+        # Paid in / withdrawn and balance cells; blank cells come through as "" or "-"
+        amounts = []
+        while i < n and len(amounts) < 2:
+            text = lines[i].strip()
+            if text in ("", "-") or amount_match(text):
+                amounts.append(text)
                 i += 1
+            else:
+                break
+
+        # The balance is always printed, so a lone value is the balance
+        if len(amounts) == 2:
+            amount, balance = clean_amount(amounts[0]), clean_amount(amounts[1])
+        elif amounts:
+            amount, balance = 0.0, clean_amount(amounts[0])
+        else:
+            amount, balance = 0.0, 0.0
+
+        entries.append((start_index, {
+            "receipt_no": receipt_no,
+            "completion_time": completion_time,
+            "details": "\n".join(details),
+            "transaction_status": transaction_status,
+            "paid_in": amount if amount > 0 else 0.0,
+            "withdrawn": amount if amount < 0 else 0.0,
+            "balance": balance
+        }))
+
+    return entries, i
+
+
+def extract_transactions(pdf, password=None, workers=1):
+    statement = open_statement(pdf, password)
+
+    if workers > 1 and len(statement) > 1:
+        return _extract_transactions_parallel(statement, workers)
+
+    entries, _ = parse_transaction_lines(statement_lines(statement))
+    return [txn for _, txn in entries]
+
+
+def _extract_chunk(source, password, page_start, page_stop):
+    # Runs in a pool worker: parse this chunk's pages plus enough of the
+    # following pages to finish a receipt that straddles the chunk boundary.
+    # ``source`` is the statement's bytes, or the path of a file to map.
+    pdf_bytes = map_file(source) if isinstance(source, str) else source
+    with StatementDocument(pdf_bytes, password) as statement:
+        lines = statement_lines(statement, page_start, page_stop)
+        own_lines = len(lines)
+
+        page_index = page_stop
+        while page_index < len(statement) and len(lines) - own_lines < TRANSACTION_LOOKAHEAD_LINES:
+            lines.extend(statement_lines(statement, page_index, page_index + 1))
+            page_index += 1
+
+    entries, resume = parse_transaction_lines(lines, 0, own_lines)
+    return entries, resume, own_lines, lines
+
+
+def _get_extraction_pool(workers):
+    global _extraction_pool, _extraction_pool_size
+
+    if _extraction_pool is None or _extraction_pool_size != workers:
+        if _extraction_pool is not None:
+            _extraction_pool.shutdown(wait=False)
+        _extraction_pool = ProcessPoolExecutor(max_workers=workers)
+        _extraction_pool_size = workers
+    return _extraction_pool
+
+
+def _extract_transactions_parallel(statement, workers):
+    page_count = len(statement)
+    chunk_size = -(-page_count // workers)
+    pool = _get_extraction_pool(workers)
+
+    # Workers map a stored statement themselves; otherwise the bytes are sent,
+    # converted once (an in-memory upload is already bytes, so no copy)
+    source = statement.path or bytes(statement.pdf_bytes)
+    futures = [
+        pool.submit(_extract_chunk, source, statement.password,
+                    page_start, min(page_start + chunk_size, page_count))
+        for page_start in range(0, page_count, chunk_size)
+    ]
+
+    transactions = []
+    carry = 0  # lines of this chunk already consumed by the previous chunk's last receipt
+    for future in futures:
+        entries, resume, own_lines, lines = future.result()
+
+        if carry:
+            # The chunk was parsed from its first line, but the serial parser
+            # would resume mid-way; re-parse until both agree on a receipt start
+            fixed, position = parse_transaction_lines(
+                lines, carry, own_lines, sync={index for index, _ in entries}
+            )
+            transactions.extend(txn for _, txn in fixed)
+            entries = [entry for entry in entries if entry[0] >= position]
+            if not entries:
+                resume = position
+
+        transactions.extend(txn for _, txn in entries)
+        carry = max(resume - own_lines, 0)
 
     return transactions
 
 
 
-def extract_pdf_properties(pdf_bytes, password=None):
+def extract_pdf_properties(pdf, password=None):
     def parse_pdf_date(pdf_date):
         try:
             if pdf_date and pdf_date.startswith("D:"):
@@ -223,11 +414,7 @@ def extract_pdf_properties(pdf_bytes, password=None):
             pass
         return "N/A"
 
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-
-    if doc.is_encrypted:
-        if not password or not doc.authenticate(password):
-            raise Exception("PDF decryption failed")
+    doc = open_statement(pdf, password).doc
 
     info = doc.metadata
     raw_version = doc.xref_get_key(1, "Version")[1]
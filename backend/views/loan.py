@@ -4,24 +4,17 @@ from werkzeug.security import generate_password_hash
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import request
 from datetime import datetime
-from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+from collections import defaultdict
+from decorator import get_current_member
+from pagination import wants_cursor, keyset_page, InvalidCursor
+from notification_service import queue_notification, queue_admin_notification
 
 
 loan_bp = Blueprint("loan_bp", __name__)
 
-
-
-def create_notification(recipient_username, message, type, loan_id=None, sender_id=None):
-    notif = Notification(
-        recipient_username=recipient_username,
-        sender_id=sender_id,
-        message=message,
-        type=type,
-        loan_id=loan_id,
-        timestamp=datetime.utcnow()
-    )
-    db.session.add(notif)
-    db.session.commit()
+# Notifications shown in a loan's history
+LOAN_STATUS_NOTIFICATION_TYPES = ('loan_approved', 'loan_rejected', 'loan_paid')
 
 
 # Apply loan
@@ -60,41 +53,36 @@ def create_loan():
 
     db.session.add(new_loan)
     db.session.flush()  # Get loan ID before commit
+    new_loan.refresh_outstanding()
 
-    # Notification for applicant
-    member_notification = Notification(
-        recipient_username=current_member.id,
+    # Notifications are written by the dispatch worker once the loan commits
+    queue_notification(
+        current_member.id,
         title="Loan Application Submitted",
         message=f"Your loan request of {data['amount']} is under review",
         type="loan_application",
         loan_id=new_loan.id
     )
-    db.session.add(member_notification)
-
-    # Notification for all admins
-    admins = Member.query.filter_by(is_admin=True).all()
-    for admin in admins:
-        admin_notification = Notification(
-            recipient_username=admin.id,
-            title="New Loan Application",
-            message=(
-                f"Member: {current_member.first_name} {current_member.last_name}\n"
-                f"Username: @{current_member.username}\n"
-                f"Amount: {data['amount']}\n"
-                f"Purpose: {data['purpose']}\n"
-                f"Applied: {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
-            ),
-            type="admin_loan_alert",
-            loan_id=new_loan.id
-        )
-        db.session.add(admin_notification)
+    queue_admin_notification(
+        title="New Loan Application",
+        message=(
+            f"Member: {current_member.first_name} {current_member.last_name}\n"
+            f"Username: @{current_member.username}\n"
+            f"Amount: {data['amount']}\n"
+            f"Purpose: {data['purpose']}\n"
+            f"Applied: {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
+        ),
+        type="admin_loan_alert",
+        loan_id=new_loan.id
+    )
+    admin_count = Member.query.filter_by(is_admin=True).count()
 
     try:
         db.session.commit()
         return jsonify({
             "success": "Loan application submitted",
             "loan_id": new_loan.id,
-            "notifications_sent": len(admins) + 1  # Count of admins + applicant
+            "notifications_sent": admin_count + 1  # Count of admins + applicant
         }), 201
     except Exception as e:
         db.session.rollback()
@@ -107,8 +95,7 @@ def create_loan():
 @jwt_required()
 def loan_history():
     # Get authenticated member
-    current_user_id = get_jwt_identity()
-    member = Member.query.get(current_user_id)
+    member = get_current_member()
 
     if not member:
         return jsonify({"error": "Member not found"}), 404  
@@ -117,14 +104,46 @@ def loan_history():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    # Query all loans for the member
-    loans = Loan.query.filter_by(member_id=member.id)\
-                     .order_by(Loan.application_date.desc())\
+    # Query all loans for the member, with their repayments in one extra query
+    query = Loan.query.filter_by(member_id=member.id)\
+                      .options(selectinload(Loan.repayments))
+
+    # ?cursor= seeks on (application_date, id) instead of OFFSET + COUNT(*)
+    if wants_cursor():
+        try:
+            items, meta = keyset_page(query, Loan.application_date, Loan.id, per_page)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        loans = query.order_by(Loan.application_date.desc())\
                      .paginate(page=page, per_page=per_page, error_out=False)
+        items = loans.items
+        meta = {
+            "total_loans": loans.total,
+            "current_page": loans.page,
+            "per_page": loans.per_page,
+            "total_pages": loans.pages
+        }
+
+    # Status change notifications for every loan on the page in one IN query
+    notifications_by_loan = defaultdict(list)
+    loan_ids = [loan.id for loan in items]
+    if loan_ids:
+        status_notifications = Notification.query.filter(
+            Notification.loan_id.in_(loan_ids),
+            Notification.type.in_(LOAN_STATUS_NOTIFICATION_TYPES)
+        ).order_by(Notification.id).all()
+
+        for note in status_notifications:
+            notifications_by_loan[note.loan_id].append({
+                "date": note.timestamp.isoformat(),
+                "message": note.message,
+                "type": note.type
+            })
 
     # Build detailed history
     history = []
-    for loan in loans.items:
+    for loan in items:
         loan_entry = {
             "loan_id": loan.id,
             "amount": float(loan.amount),
@@ -134,8 +153,7 @@ def loan_history():
             "approval_date": loan.approval_date.isoformat() if loan.approval_date else None,
             "term_months": loan.term_months, 
             "interest_rate": loan.interest_rate,
-            "repayments": [],
-            "notifications": []
+            "repayments": []
         }
 
         # Add repayments
@@ -147,32 +165,13 @@ def loan_history():
             })
 
         # Add status change notifications
-        status_notifications = Notification.query.filter(
-            Notification.loan_id == loan.id,
-            or_(
-                Notification.type == 'loan_approved',
-                Notification.type == 'loan_rejected',
-                Notification.type == 'loan_paid'
-            )
-        ).all()
-
-        for note in status_notifications:
-            loan_entry["notifications"].append({
-                "date": note.timestamp.isoformat(),
-                "message": note.message,
-                "type": note.type
-            })
+        loan_entry["notifications"] = notifications_by_loan[loan.id]
 
         history.append(loan_entry)
 
     return jsonify({
         "loans": history,
-        "meta": {
-            "total_loans": loans.total,
-            "current_page": loans.page,
-            "per_page": loans.per_page,
-            "total_pages": loans.pages
-        }
+        "meta": meta
     })
 
 # loan reypayment history
@@ -228,13 +227,12 @@ def check_loan_payment_status(loan_id):
     if loan.member_id != member.id:
         return jsonify({"message": "You are not authorized to view this loan"}), 403
 
-    # Calculate total repayment amount
-    total_repaid = sum([float(r.amount) for r in loan.repayments])
+    # Running repayment total is stored on the loan
+    total_repaid = float(loan.total_repaid)
 
     # Calculate total payable (loan amount + interest)
     loan_amount = float(loan.amount)
-    interest_amount = loan_amount * (float(loan.interest_rate) / 100)
-    total_payable = loan_amount + interest_amount
+    total_payable = float(loan.total_due)
 
     # Check if loan is fully paid
     is_fully_paid = total_repaid >= total_payable
@@ -1,20 +1,93 @@
-from models import Notification,db,Member
-from flask import jsonify,request, Blueprint
+from models import Notification,db,Member, BroadcastNotification, BroadcastReceipt, unread_counter_update
+from flask import jsonify,request, Blueprint, Response
 from werkzeug.security import generate_password_hash
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import request
-from sqlalchemy import desc 
+from sqlalchemy import desc, select, insert, union_all, literal, and_, or_, func
+from datetime import datetime
+from decorator import get_current_member
+from notification_stream import notification_hub
+import json
+from pagination import wants_cursor, keyset_page, InvalidCursor
 
 
 notification_bp = Blueprint("notification_bp", __name__)
 
 
+def _visible_broadcasts(member, *columns):
+    """Select ``columns`` over the broadcasts ``member`` can see, with their receipt joined.
+
+    A member sees every broadcast except their own, from after they joined,
+    unless they deleted it.
+    """
+    query = select(*columns).select_from(BroadcastNotification).outerjoin(
+        BroadcastReceipt,
+        and_(BroadcastReceipt.broadcast_id == BroadcastNotification.id,
+             BroadcastReceipt.member_id == member.id)
+    ).where(
+        BroadcastNotification.sender_id != member.id,
+        or_(BroadcastReceipt.deleted.is_(None), BroadcastReceipt.deleted == False)
+    )
+    if member.join_date:
+        query = query.where(BroadcastNotification.timestamp >= member.join_date)
+    return query
+
+
+def unread_count(member):
+    """Unread notifications of ``member``: the stored counter covers direct
+    notifications, unread broadcasts are counted here so a broadcast never
+    has to touch every member row.
+    """
+    unread_broadcasts = db.session.execute(
+        _visible_broadcasts(member, func.count()).where(BroadcastReceipt.read_at.is_(None))
+    ).scalar()
+    return member.unread_notifications + unread_broadcasts
+
+
+def member_notifications(member):
+    """Direct and broadcast notifications of ``member`` as one subquery.
+
+    ``sort_id`` orders rows with the same timestamp and is unique across both
+    sources (even for direct notifications, odd for broadcasts).
+    """
+    direct = select(
+        literal('direct').label('source'),
+        Notification.id.label('id'),
+        Notification.title.label('title'),
+        Notification.message.label('message'),
+        Notification.type.label('type'),
+        Notification.is_read.label('is_read'),
+        Notification.timestamp.label('timestamp'),
+        Notification.loan_id.label('loan_id'),
+        Notification.sender_id.label('sender_id'),
+        (Notification.id * 2).label('sort_id')
+    ).where(Notification.recipient_username == member.id)
+
+    broadcast = _visible_broadcasts(
+        member,
+        literal('broadcast').label('source'),
+        BroadcastNotification.id.label('id'),
+        BroadcastNotification.title.label('title'),
+        BroadcastNotification.message.label('message'),
+        BroadcastNotification.type.label('type'),
+        BroadcastReceipt.read_at.isnot(None).label('is_read'),
+        BroadcastNotification.timestamp.label('timestamp'),
+        BroadcastNotification.loan_id.label('loan_id'),
+        BroadcastNotification.sender_id.label('sender_id'),
+        (BroadcastNotification.id * 2 + 1).label('sort_id')
+    )
+
+    return union_all(direct, broadcast).subquery('member_notifications')
+
+
 # get notification
 @notification_bp.route('/notifications', methods=['GET'])
 @jwt_required()
 def get_user_notifications():
-    """Get paginated notifications for the authenticated user"""
-    current_user_id = get_jwt_identity()
+    """Get paginated notifications (direct and broadcast) for the authenticated user"""
+    member = get_current_member()
+    if not member:
+        return jsonify({'error': 'Member not found'}), 404
     
     # Pagination and filtering
     page = request.args.get('page', 1, type=int)
@@ -23,21 +96,41 @@ def get_user_notifications():
     notification_type = request.args.get('type')
     loan_id = request.args.get('loan_id')
 
-    query = Notification.query.filter_by(recipient_username=current_user_id)
+    notifications = member_notifications(member)
+    query = db.session.query(notifications)
 
     if unread_only:
-        query = query.filter_by(is_read=False)
+        query = query.filter(notifications.c.is_read == False)
     if notification_type:
-        query = query.filter_by(type=notification_type)
+        query = query.filter(notifications.c.type == notification_type)
     if loan_id:
-        query = query.filter_by(loan_id=loan_id)
+        query = query.filter(notifications.c.loan_id == loan_id)
+
+    # ?cursor= seeks on (timestamp, sort_id) instead of OFFSET + COUNT(*)
+    if wants_cursor():
+        try:
+            items, meta = keyset_page(query, notifications.c.timestamp, notifications.c.sort_id, per_page)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        page_items = query.order_by(desc(notifications.c.timestamp), desc(notifications.c.sort_id))\
+                          .paginate(page=page, per_page=per_page, error_out=False)
+        items = page_items.items
+        meta = {
+            "total": page_items.total,
+            "pages": page_items.pages,
+            "current_page": page_items.page
+        }
+    meta["unread_count"] = unread_count(member)
 
-    notifications = query.order_by(desc(Notification.timestamp))\
-                       .paginate(page=page, per_page=per_page, error_out=False)
+    # Senders for the whole page in one query
+    sender_ids = {n.sender_id for n in items if n.sender_id}
+    senders = {m.id: m for m in Member.query.filter(Member.id.in_(sender_ids))} if sender_ids else {}
 
     return jsonify({
         "notifications": [{
             "id": n.id,
+            "source": n.source,
             "title": n.title,
             "message": n.message,
             "type": n.type,
@@ -45,19 +138,51 @@ def get_user_notifications():
             "timestamp": n.timestamp.isoformat(),
             "loan_id": n.loan_id,
             "sender": {
-                "username": n.sender.username,
-                "name": f"{n.sender.first_name} {n.sender.last_name}"
-            } if n.sender else None
-        } for n in notifications.items],
-        "meta": {
-            "total": notifications.total,
-            "pages": notifications.pages,
-            "current_page": notifications.page,
-            "unread_count": Notification.query.filter_by(
-                recipient_username=current_user_id,
-                is_read=False
-            ).count()
-        }
+                "username": senders[n.sender_id].username,
+                "name": f"{senders[n.sender_id].first_name} {senders[n.sender_id].last_name}"
+            } if n.sender_id in senders else None
+        } for n in items],
+        "meta": meta
+    })
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Push new notifications instead of polling
+@notification_bp.route('/notifications/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_notifications():
+    """Server-Sent Events stream of new notifications for the authenticated user.
+
+    EventSource cannot set headers, so the token may also be passed as ?jwt=.
+    Opens with the current unread count; a "resync" event means events were
+    dropped and the client should refetch /notifications.
+    """
+    member = get_current_member()
+    if not member:
+        return jsonify({'error': 'Member not found'}), 404
+
+    subscription = notification_hub.subscribe(member.id)
+    unread = unread_count(member)
+    keepalive = notification_hub.keepalive_seconds
+
+    def events():
+        try:
+            yield _sse('unread', {'count': unread})
+            while True:
+                payload = subscription.get(timeout=keepalive)
+                if subscription.overflowed:
+                    yield _sse('resync', {})
+                    return
+                yield _sse('notification', payload) if payload else ': keepalive\n\n'
+        finally:
+            notification_hub.unsubscribe(subscription)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 
@@ -72,7 +197,9 @@ def mark_notification_read(notification_id):
     if not notification:
         return jsonify({'error': 'Notification not found'}), 404
 
-    notification.is_read = True
+    # Only the request that flips it to read takes it off the counter
+    if Notification.query.filter_by(id=notification_id, is_read=False).update({'is_read': True}):
+        db.session.execute(unread_counter_update(-1, Member.id == notification.recipient_username))
     db.session.commit()
 
     return jsonify({"success": "Notification marked as read"}), 200
@@ -84,15 +211,38 @@ def mark_notification_read(notification_id):
 def mark_all_notifications_read():
     """Mark all user notifications as read"""
     current_user_id = get_jwt_identity()
+    member = get_current_member()
+    if not member:
+        return jsonify({'error': 'Member not found'}), 404
     
     updated_count = Notification.query.filter_by(
         recipient_username=current_user_id,
         is_read=False
     ).update({'is_read': True})
 
+    # Broadcasts: stamp existing receipts, then add receipts for the rest
+    now = datetime.utcnow()
+    unread_broadcasts = _visible_broadcasts(member, BroadcastNotification.id)\
+        .where(BroadcastReceipt.read_at.is_(None))
+    broadcast_count = BroadcastReceipt.query.filter(
+        BroadcastReceipt.member_id == member.id,
+        BroadcastReceipt.read_at.is_(None),
+        BroadcastReceipt.broadcast_id.in_(unread_broadcasts.where(BroadcastReceipt.member_id.isnot(None)))
+    ).update({'read_at': now}, synchronize_session=False)
+    broadcast_count += db.session.execute(
+        insert(BroadcastReceipt).from_select(
+            ['broadcast_id', 'member_id', 'read_at', 'deleted'],
+            _visible_broadcasts(
+                member, BroadcastNotification.id, literal(member.id), literal(now), literal(False)
+            ).where(BroadcastReceipt.member_id.is_(None))
+        )
+    ).rowcount
+
+    # The counter only covers direct notifications
+    db.session.execute(unread_counter_update(-updated_count, Member.id == member.id))
     db.session.commit()
     return jsonify({
-        "success": f"Marked {updated_count} notifications as read"
+        "success": f"Marked {updated_count + broadcast_count} notifications as read"
     }), 200
 
 
@@ -101,14 +251,11 @@ def mark_all_notifications_read():
 @jwt_required()
 def get_unread_count():
     """Get count of unread notifications"""
-    current_user_id = get_jwt_identity()
-    
-    count = Notification.query.filter_by(
-        recipient_username=current_user_id,
-        is_read=False
-    ).count()
+    member = get_current_member()
+    if not member:
+        return jsonify({'error': 'Member not found'}), 404
 
-    return jsonify({"count": count}), 200
+    return jsonify({"count": unread_count(member)}), 200
 
 
 
@@ -126,4 +273,55 @@ def delete_notification(notification_id):
     db.session.delete(notification)
     db.session.commit()
 
-    return jsonify({"success": "Notification deleted successfully"}), 200
\ No newline at end of file
+    return jsonify({"success": "Notification deleted successfully"}), 200
+
+
+def _broadcast_receipt(broadcast_id):
+    """The current member's receipt for a broadcast they can see, created if missing."""
+    member = get_current_member()
+    if not member:
+        return None
+
+    visible = db.session.execute(
+        _visible_broadcasts(member, BroadcastNotification.id)
+        .where(BroadcastNotification.id == broadcast_id)
+    ).first()
+    if not visible:
+        return None
+
+    receipt = BroadcastReceipt.query.get((broadcast_id, member.id))
+    if not receipt:
+        receipt = BroadcastReceipt(broadcast_id=broadcast_id, member_id=member.id, deleted=False)
+        db.session.add(receipt)
+    return receipt
+
+
+# Mark a broadcast as read
+@notification_bp.route('/read/broadcast/<int:broadcast_id>', methods=['PATCH'])
+@jwt_required()
+def mark_broadcast_read(broadcast_id):
+    """Mark a broadcast notification as read for the authenticated user"""
+    receipt = _broadcast_receipt(broadcast_id)
+    if not receipt:
+        return jsonify({'error': 'Notification not found'}), 404
+
+    if receipt.read_at is None:
+        receipt.read_at = datetime.utcnow()
+    db.session.commit()
+
+    return jsonify({"success": "Notification marked as read"}), 200
+
+
+# Delete a broadcast from the user's notifications
+@notification_bp.route('/notification/broadcast/<int:broadcast_id>', methods=['DELETE'])
+@jwt_required()
+def delete_broadcast(broadcast_id):
+    """Hide a broadcast notification for the authenticated user"""
+    receipt = _broadcast_receipt(broadcast_id)
+    if not receipt:
+        return jsonify({'message': 'Notification not found'}), 404
+
+    receipt.deleted = True
+    db.session.commit()
+
+    return jsonify({"success": "Notification deleted successfully"}), 200
@@ -5,26 +5,16 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import request
 from decimal import Decimal
 from datetime import datetime
+from idempotency import idempotent
+from notification_service import queue_notification
 
 
 repayment_bp = Blueprint("repayment_bp", __name__)
 
 
-def create_notification(recipient_username, message, type, loan_id=None, sender_id=None):
-    notif = Notification(
-        recipient_username=recipient_username,
-        sender_id=sender_id,
-        message=message,
-        type=type,
-        loan_id=loan_id,
-        timestamp=datetime.utcnow()
-    )
-    db.session.add(notif)
-    db.session.commit()
-
-
 @repayment_bp.route('/repayments/<int:loan_id>', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_repayment(loan_id):
     current_user_id = get_jwt_identity()
     current_user = Member.query.get(current_user_id)
@@ -48,58 +38,54 @@ def create_repayment(loan_id):
     if amount <= 0:
         return jsonify({"error": "Amount must be positive"}), 400
 
-    # --- Calculate totals ---
-    total_due = loan.amount * (Decimal('1') + loan.interest_rate / Decimal('100'))
-    total_repaid = sum((r.amount for r in loan.repayments), Decimal('0.00'))
-    new_total_repaid = total_repaid + amount
-
-    # --- Calculate how much is interest vs principal ---
-    total_interest_due = loan.amount * (loan.interest_rate / Decimal('100'))
-    total_principal_due = loan.amount
-
-    # Already repaid breakdown
-    repaid_interest = sum((r.interest_component for r in loan.repayments), Decimal('0.00'))
-    repaid_principal = sum((r.principal_component for r in loan.repayments), Decimal('0.00'))
+    # Member account
+    member_account = Account.query.filter_by(member_id=current_user.id).first()
+    if not member_account:
+        return jsonify({"error": "Member account not found"}), 404
 
-    # Remaining breakdown
-    remaining_interest = total_interest_due - repaid_interest
-    remaining_principal = total_principal_due - repaid_principal
+    total_due = loan.total_due
+
+    # The split depends on the interest already repaid; if another repayment
+    # changes it between our read and the update, re-read and split again
+    for _ in range(3):
+        remaining_interest = loan.interest_due - loan.interest_repaid
+        interest_component = max(min(amount, remaining_interest), Decimal('0.00'))
+        principal_component = amount - interest_component
+
+        totals = loan.apply_repayment(amount, principal_component, interest_component)
+        if totals is not None:
+            break
+        db.session.refresh(loan)
+        if loan.status != 'approved':
+            return jsonify({"error": "Cannot repay non-approved loans"}), 400
+    else:
+        db.session.rollback()
+        return jsonify({"error": "Loan is being updated, please retry"}), 409
 
-    # Allocate repayment
-    interest_component = min(amount, remaining_interest)
-    principal_component = amount - interest_component
+    new_total_repaid, balance = totals
 
     # Create repayment with split
-    repayment = LoanRepayment(
+    db.session.add(LoanRepayment(
         loan_id=loan_id,
         amount=amount,
         payment_method=payment_method,
         principal_component=principal_component,
         interest_component=interest_component
-    )
-    db.session.add(repayment)
-
-    balance = total_due - new_total_repaid
+    ))
 
-    # Member account
-    member_account = Account.query.filter_by(member_id=current_user.id).first()
-    if not member_account:
-        return jsonify({"error": "Member account not found"}), 404
-
-    # Fully paid or overpaid
+    # Fully paid or overpaid, judged from the updated row
     excess_amount = Decimal('0.00')
     if new_total_repaid >= total_due:
         loan.status = 'paid'
         loan.due_date = datetime.utcnow()
 
-        notification = Notification(
-            recipient_username=current_user.id,
+        queue_notification(
+            current_user.id,
             title="Loan Fully Repaid",
             message=f"Loan #{loan_id} has been fully settled. Total paid: {new_total_repaid}",
             type="loan_paid",
             loan_id=loan_id
         )
-        db.session.add(notification)
 
         # Handle overpayment
         excess_amount = new_total_repaid - total_due
@@ -112,7 +98,7 @@ def create_repayment(loan_id):
             "success": "Repayment recorded",
             "principal_component": float(principal_component),
             "interest_component": float(interest_component),
-            "balance_remaining": float(balance if balance > 0 else 0),
+            "balance_remaining": float(balance),
             "loan_status": loan.status,
             "overpaid_amount": float(excess_amount) if excess_amount > 0 else 0.0
         }), 201
@@ -183,15 +169,9 @@ def get_repayment_history(loan_id):
     # Get all repayments
     repayments = loan.repayments
 
-    # Calculate total repaid
-    total_repaid = sum(float(r.amount) for r in repayments)
-
-    # Calculate total due (loan amount + interest)
-    loan_amount = float(loan.amount)
-    interest_amount = loan_amount * (float(loan.interest_rate) / 100)
-    total_due = loan_amount + interest_amount
-
-    # Calculate balance (total due - total repaid)
+    # Running totals are stored on the loan
+    total_repaid = float(loan.total_repaid)
+    total_due = float(loan.total_due)
     balance = total_due - total_repaid
 
     # Format repayment history
@@ -0,0 +1,131 @@
+from flask import jsonify, request, Blueprint
+from flask_jwt_extended import jwt_required
+from models import db, PdfDocument, StatementTransaction
+from decorator import analyst_required
+from datetime import datetime
+from sqlalchemy import insert
+
+
+statement_bp = Blueprint("statement_bp", __name__)
+
+
+def parse_completion_time(value):
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d %H:%M:%S")
+    except (AttributeError, ValueError):
+        return None
+
+
+def save_statement_transactions(transactions, pdf_id):
+    rows = [{
+        "pdf_id": pdf_id,
+        "receipt_no": txn["receipt_no"],
+        "completed_at": parse_completion_time(txn.get("completion_time")),
+        "completion_time": txn.get("completion_time"),
+        "details": txn.get("details"),
+        "category": txn["details"].strip().replace('\n', ' '),
+        "transaction_status": txn.get("transaction_status"),
+        "paid_in": txn.get("paid_in", 0.0),
+        "withdrawn": txn.get("withdrawn", 0.0),
+        "balance": txn.get("balance", 0.0)
+    } for txn in transactions]
+
+    # Re-analysis of the same document replaces its earlier rows; the caller commits
+    StatementTransaction.query.filter_by(pdf_id=pdf_id).delete()
+    if rows:
+        db.session.execute(insert(StatementTransaction), rows)
+
+
+def serialize_statement_transaction(t):
+    return {
+        "id": t.id,
+        "receipt_no": t.receipt_no,
+        "completion_time": t.completion_time,
+        "completed_at": t.completed_at.isoformat() if t.completed_at else None,
+        "details": t.details,
+        "category": t.category,
+        "transaction_status": t.transaction_status,
+        "paid_in": t.paid_in,
+        "withdrawn": t.withdrawn,
+        "balance": t.balance
+    }
+
+
+# List extracted transactions of an uploaded statement
+@statement_bp.route('/statements/<int:pdf_id>/transactions', methods=['GET'])
+@jwt_required()
+@analyst_required
+def get_statement_transactions(pdf_id):
+    if not PdfDocument.query.get(pdf_id):
+        return jsonify({"error": "Statement not found"}), 404
+
+    # Pagination and filtering
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), 500))
+    category = request.args.get('category')
+    search = request.args.get('search')
+    status = request.args.get('status')
+    direction = request.args.get('direction')  # 'in' or 'out'
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+
+    query = StatementTransaction.query.filter_by(pdf_id=pdf_id)
+
+    if category:
+        query = query.filter(StatementTransaction.category == category)
+    if search:
+        query = query.filter(StatementTransaction.category.ilike(f"%{search}%"))
+    if status:
+        query = query.filter(StatementTransaction.transaction_status == status)
+    if direction == 'in':
+        query = query.filter(StatementTransaction.paid_in > 0)
+    elif direction == 'out':
+        query = query.filter(StatementTransaction.withdrawn < 0)
+
+    # Date range filter
+    if start_date:
+        try:
+            start_date = datetime.fromisoformat(start_date)
+            query = query.filter(StatementTransaction.completed_at >= start_date)
+        except ValueError:
+            return jsonify({"error": "Invalid start_date format (use ISO format)"}), 400
+
+    if end_date:
+        try:
+            end_date = datetime.fromisoformat(end_date)
+            query = query.filter(StatementTransaction.completed_at <= end_date)
+        except ValueError:
+            return jsonify({"error": "Invalid end_date format (use ISO format)"}), 400
+
+    transactions = query.order_by(StatementTransaction.completed_at, StatementTransaction.id)\
+                        .paginate(page=page, per_page=per_page, error_out=False)
+
+    return jsonify({
+        "transactions": [serialize_statement_transaction(t) for t in transactions.items],
+        "meta": {
+            "total": transactions.total,
+            "pages": transactions.pages,
+            "current_page": transactions.page,
+            "per_page": per_page,
+            "filters": {
+                "category": category,
+                "search": search,
+                "status": status,
+                "direction": direction,
+                "start_date": start_date.isoformat() if start_date else None,
+                "end_date": end_date.isoformat() if end_date else None
+            }
+        }
+    }), 200
+
+
+# Look up a single receipt on an uploaded statement
+@statement_bp.route('/statements/<int:pdf_id>/transactions/<receipt_no>', methods=['GET'])
+@jwt_required()
+@analyst_required
+def get_statement_transaction(pdf_id, receipt_no):
+    transaction = StatementTransaction.query.filter_by(pdf_id=pdf_id, receipt_no=receipt_no).first()
+    if not transaction:
+        return jsonify({"error": "Transaction not found"}), 404
+
+    return jsonify(serialize_statement_transaction(transaction)), 200
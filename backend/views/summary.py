@@ -1,7 +1,8 @@
 from flask import Flask, request, jsonify, Blueprint
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.utils import secure_filename
-from models import db, PdfDocument, SpendingSummary, ReceivedSummary
+from models import db, PdfDocument, SpendingSummary, ReceivedSummary, CustomerDetails
+from sqlalchemy import insert
 from datetime import datetime
 import os
 from collections import defaultdict
@@ -9,85 +10,122 @@ from collections import defaultdict
 summary_bp = Blueprint("summary_bp", __name__)
 
 
-def generate_and_spend_summary(transactions, pdf_id):
-    spending_summary = defaultdict(lambda: {
-        'total': 0.0,
-        'count': 0,
-        'transactions': []
-    })
+def generate_summaries(transactions, receipts_only=False):
+    """Aggregate spending and received money per category in one pass.
+
+    Only computes; save_summaries() writes the rows, so the database is not
+    touched while a statement is being analyzed.
+    """
+    spending_summary = defaultdict(lambda: {'total': 0.0, 'count': 0, 'transactions': []})
+    received_summary = defaultdict(lambda: {'total': 0.0, 'count': 0, 'transactions': []})
 
     for txn in transactions:
         withdraw = txn.get("withdrawn", 0.0)
+        paid_in = txn.get("paid_in")
 
-        # Only consider withdrawals (negative values)
-        if withdraw >= 0.0:
-            continue  
+        # Only withdrawals (negative values) and incoming amounts are summarized
+        if withdraw >= 0.0 and not paid_in:
+            continue
 
         detail = txn["details"].strip().replace('\n', ' ')
-        spending_summary[detail]['total'] += abs(withdraw)
-        spending_summary[detail]['count'] += 1
-
-        # Save full txn for drill-down
-        spending_summary[detail]['transactions'].append({
-            "receipt_no": txn.get("receipt_no"),
-            "completion_time": txn.get("completion_time"),
-            "details": txn.get("details"),
-            "transaction_status": txn.get("transaction_status"),
-            "withdrawn": withdraw,
-            "balance": txn.get("balance")
-        })
-
-    result_list = []
-    for detail, values in spending_summary.items():
-        # Store aggregated summary in DB
-        entry = SpendingSummary(
-            pdf_id=pdf_id,
-            category=detail,
-            total_spent=round(values['total'], 2),
-            transaction_count=values['count']
-        )
-        db.session.add(entry)
-
-        # Response includes drill-down data
-        result_list.append({
-            "category": detail,
-            "total_spent": round(values['total'], 2),
-            "transaction_count": values['count'],
-            "transactions": values['transactions']   # 👈 added drill-down list
-        })
-
-    db.session.commit()
-    return result_list
-
-
-def generate_and_received_summary(transactions, pdf_id):
-    received_summary = defaultdict(lambda: {'total': 0.0, 'count': 0, 'transactions': []})
 
-    for txn in transactions:
-        if not txn.get("paid_in") or txn["paid_in"] == 0.0:
-            continue  # Skip transactions with no incoming amount
-
-        detail = txn["details"].strip().replace('\n', ' ')
-        received_summary[detail]['total'] += txn["paid_in"]
-        received_summary[detail]['count'] += 1
-        received_summary[detail]['transactions'].append(txn)  # keep full transaction
-
-    result_list = []
-    for detail, values in received_summary.items():
-        entry = ReceivedSummary(
-            pdf_id=pdf_id,
-            category=detail,
-            total_received=round(values['total'], 2),
-            transaction_count=values['count']
-        )
-        db.session.add(entry)
-
-        result_list.append({
-            "category": detail,
-            "total_received": round(values['total'], 2),
-            "transaction_count": values['count'],
-            "transactions": values['transactions']  # include full details
-        })
-
-    db.session.commit()
-    return result_list
\ No newline at end of file
+        if withdraw < 0.0:
+            spending_summary[detail]['total'] += abs(withdraw)
+            spending_summary[detail]['count'] += 1
+
+            # Save full txn for drill-down (or just its receipt number)
+            spending_summary[detail]['transactions'].append(txn.get("receipt_no") if receipts_only else {
+                "receipt_no": txn.get("receipt_no"),
+                "completion_time": txn.get("completion_time"),
+                "details": txn.get("details"),
+                "transaction_status": txn.get("transaction_status"),
+                "withdrawn": withdraw,
+                "balance": txn.get("balance")
+            })
+
+        if paid_in:
+            received_summary[detail]['total'] += paid_in
+            received_summary[detail]['count'] += 1
+
+            # Full transaction for drill-down (or just its receipt number)
+            received_summary[detail]['transactions'].append(
+                txn.get("receipt_no") if receipts_only else txn
+            )
+
+    # Response includes drill-down data
+    spending_list = [{
+        "category": detail,
+        "total_spent": round(values['total'], 2),
+        "transaction_count": values['count'],
+        "transactions": values['transactions']
+    } for detail, values in spending_summary.items()]
+
+    received_list = [{
+        "category": detail,
+        "total_received": round(values['total'], 2),
+        "transaction_count": values['count'],
+        "transactions": values['transactions']
+    } for detail, values in received_summary.items()]
+
+    return spending_list, received_list
+
+
+def save_summaries(pdf_id, spending_list, received_list, metadata=None):
+    """Write the aggregates from generate_summaries() with one executemany per table.
+
+    Not committed: the caller commits them together with the PdfDocument,
+    so a failed extraction leaves nothing behind.
+    """
+    # Re-analysis of the same document replaces its earlier rows; the caller commits
+    SpendingSummary.query.filter_by(pdf_id=pdf_id).delete()
+    ReceivedSummary.query.filter_by(pdf_id=pdf_id).delete()
+    if metadata:
+        CustomerDetails.query.filter_by(pdf_id=pdf_id).delete()
+
+    # Store aggregated summaries in DB
+    if spending_list:
+        db.session.execute(insert(SpendingSummary), [{
+            "pdf_id": pdf_id,
+            "category": entry["category"],
+            "total_spent": entry["total_spent"],
+            "transaction_count": entry["transaction_count"]
+        } for entry in spending_list])
+
+    if received_list:
+        db.session.execute(insert(ReceivedSummary), [{
+            "pdf_id": pdf_id,
+            "category": entry["category"],
+            "total_received": entry["total_received"],
+            "transaction_count": entry["transaction_count"]
+        } for entry in received_list])
+
+    if metadata:
+        db.session.execute(insert(CustomerDetails), [{
+            "pdf_id": pdf_id,
+            "customer_name": metadata["customer_name"],
+            "mobile_number": metadata["mobile_number"],
+            "email_address": metadata["email_address"],
+            "statement_period": metadata["statement_period"],
+            "request_date": metadata["request_date"],
+            "statement_duration_months": metadata["statement_duration_months"] or 0
+        }])
+
+
+def get_saved_summaries(pdf_id):
+    # Aggregates persisted by save_summaries() above (no drill-down lists)
+    spending = SpendingSummary.query.filter_by(pdf_id=pdf_id).all()
+    received = ReceivedSummary.query.filter_by(pdf_id=pdf_id).all()
+
+    spending_money_summary = [{
+        "category": s.category,
+        "total_spent": s.total_spent,
+        "transaction_count": s.transaction_count
+    } for s in spending]
+
+    received_money_summary = [{
+        "category": r.category,
+        "total_received": r.total_received,
+        "transaction_count": r.transaction_count
+    } for r in received]
+
+    return spending_money_summary, received_money_summary
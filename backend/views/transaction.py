@@ -4,6 +4,8 @@ from werkzeug.security import generate_password_hash
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask import request
 from werkzeug.security import check_password_hash
+from idempotency import idempotent
+from pagination import wants_cursor, keyset_page, InvalidCursor
 
 
 transaction_bp = Blueprint("transaction_bp", __name__)
@@ -11,6 +13,7 @@ transaction_bp = Blueprint("transaction_bp", __name__)
 # transaction
 @transaction_bp.route("/transaction", methods=["POST"])
 @jwt_required()
+@idempotent
 def transaction():
     current_user_id = get_jwt_identity()
     member = Member.query.get(current_user_id)
@@ -38,17 +41,21 @@ def transaction():
     except (ValueError, TypeError):
         return jsonify({"error": "Invalid amount"}), 400
 
+    if amount <= 0:
+        return jsonify({"error": "Amount must be positive"}), 400
+
     if action == "deposit":
         member.account.deposit(amount)
         db.session.commit()
         return jsonify({"success": "Deposit successful"}), 200
 
     elif action == "withdraw":
-        if member.account.balance >= amount:
-            member.account.withdraw(amount)
+        # The funds check happens inside the UPDATE, not before it
+        if member.account.withdraw(amount):
             db.session.commit()
             return jsonify({"success": "Withdraw successful"}), 200
         else:
+            db.session.rollback()
             return jsonify({"error": "Insufficient balance"}), 400
 
     else:
@@ -72,9 +79,27 @@ def transaction_history():
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 10, type=int)
 
-    # Fetch transactions with pagination
-    transactions = Transaction.query.filter_by(account_id=member.account.id) \
-                                     .paginate(page=page, per_page=per_page, error_out=False)
+    query = Transaction.query.filter_by(account_id=member.account.id)
+
+    # ?cursor= seeks on (timestamp, id) instead of OFFSET + COUNT(*)
+    if wants_cursor():
+        try:
+            items, pagination_data = keyset_page(query, Transaction.timestamp, Transaction.id, per_page)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+    else:
+        # Fetch transactions with pagination, newest first
+        transactions = query.order_by(Transaction.timestamp.desc(), Transaction.id.desc()) \
+                            .paginate(page=page, per_page=per_page, error_out=False)
+        items = transactions.items
+
+        # Prepare pagination data for the response
+        pagination_data = {
+            "page": page,
+            "per_page": per_page,
+            "total": transactions.total,
+            "pages": transactions.pages,
+        }
 
     # Format the transactions for the response
     transaction_history = [
@@ -84,17 +109,9 @@ def transaction_history():
             "amount": transaction.amount,
             "timestamp": transaction.timestamp.isoformat(),
         }
-        for transaction in transactions.items
+        for transaction in items
     ]
 
-    # Prepare pagination data for the response
-    pagination_data = {
-        "page": page,
-        "per_page": per_page,
-        "total": transactions.total,
-        "pages": transactions.pages,
-    }
-
     return jsonify({
         "transactions": transaction_history,
         "pagination": pagination_data
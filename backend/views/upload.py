@@ -1,13 +1,21 @@
-from flask import Flask, request, jsonify, Blueprint
+from flask import Flask, request, jsonify, Blueprint, current_app, Response
 from werkzeug.utils import secure_filename
-from datetime import datetime
-from models import db,PdfDocument, Member
+from datetime import datetime, timedelta
+from models import db,PdfDocument, UploadJob, CustomerDetails, StatementTransaction
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import json
 import magic
 import fitz
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from decorator import analyst_required
-from views.summary import generate_and_spend_summary, generate_and_received_summary
+from blobstore import get_blob_store
+from views.summary import generate_summaries, save_summaries, get_saved_summaries
+from views.statement import save_statement_transactions, serialize_statement_transaction
 from views.extract import (
+    StatementDocument,
+    open_stored_statement,
     extract_transactions,
     extract_metadata,
     extract_summary_table,
@@ -17,19 +25,16 @@ from views.extract import (
 
 upload_bp = Blueprint("upload_bp", __name__)
 
+_upload_executor = None
+_jobs_recovered = False
 
-def is_mpesa_statement(pdf_bytes, password=None):
-    try:
-        doc = fitz.open(stream=pdf_bytes, filetype='pdf')
-        if doc.is_encrypted:
-            if not password or not doc.authenticate(password):
-                return False
 
+def is_mpesa_statement(statement):
+    try:
         # Read the first 2 pages
         text = ""
-        for i in range(min(2, len(doc))):
-            page = doc.load_page(i)
-            text += page.get_text().lower()
+        for i in range(min(2, len(statement))):
+            text += statement.page_text(i).lower()
 
         required_keywords = [
             "m-pesa statement",
@@ -53,11 +58,8 @@ def is_mpesa_statement(pdf_bytes, password=None):
 @jwt_required()
 @analyst_required
 def upload_pdf():
-    # Verify  privileges
+    # Analyst privileges are checked by @analyst_required
     current_user_id = get_jwt_identity()
-    analyst = Member.query.get(current_user_id)
-    if not analyst or not analyst.is_analyst:
-        return jsonify({"error": "Data Analyst privileges required"}), 403
 
     if 'file' not in request.files:
         return jsonify({"error": "No file provided"}), 400
@@ -70,6 +72,8 @@ def upload_pdf():
         return jsonify({"error": "File must be a PDF"}), 400
 
     password = request.form.get('password', '').strip() or None
+    run_async = request.args.get('async', '').lower() == 'true'
+    stream = request.accept_mimetypes.best == 'application/x-ndjson'
 
     try:
         pdf_bytes = file.read()
@@ -80,50 +84,357 @@ def upload_pdf():
         if mime != 'application/pdf':
             return jsonify({"error": "Uploaded file is not a valid PDF"}), 400
 
-        pdf_properties = extract_pdf_properties(pdf_bytes, password)
-
-        if not is_valid_mpesa_document(pdf_properties):
-            return jsonify({"error": "The uploaded PDF does not meet required M-PESA statement properties."}), 400
-
+        # Parse once; every extractor below shares this document
         try:
-            doc = fitz.open(stream=pdf_bytes, filetype='pdf')
-        except Exception:
+            statement = StatementDocument(pdf_bytes, password)
+        except fitz.FileDataError:
             return jsonify({"error": "Invalid or corrupted PDF file."}), 400
 
-        if not is_mpesa_statement(pdf_bytes, password):
+        # Identical bytes were uploaded before: answer from the database
+        content_hash = hashlib.sha256(pdf_bytes).hexdigest()
+        new_doc = PdfDocument.query.filter_by(content_hash=content_hash).first()
+        if new_doc:
+            # Jobs lost with a restarted worker must not block re-uploads
+            fail_stale_jobs(new_doc.upload_jobs)
+            active_job = next((j for j in new_doc.upload_jobs if j.status in ('queued', 'running')), None)
+            if active_job:
+                statement.close()
+                return jsonify({
+                    "success": "Upload already queued for analysis",
+                    "job_id": active_job.id,
+                    "status": active_job.status
+                }), 202
+
+            # Re-analyze into the same document only if every earlier attempt failed
+            if not new_doc.upload_jobs or any(j.status == 'done' for j in new_doc.upload_jobs):
+                statement.close()
+                if stream:
+                    return stream_analysis(saved_analysis(new_doc))
+                return jsonify(saved_analysis(new_doc)), 200
+
+        if not is_valid_mpesa_document(extract_pdf_properties(statement)):
+            statement.close()
+            return jsonify({"error": "The uploaded PDF does not meet required M-PESA statement properties."}), 400
+
+        if not is_mpesa_statement(statement):
+            statement.close()
             return jsonify({"error": "This PDF does not appear to be a valid M-PESA statement."}), 400
 
-        #  Save the file metadata to DB
-        new_doc = PdfDocument(
-            filename=filename,
-            content=pdf_bytes,
-            uploaded_at=datetime.utcnow()
-        )
-        db.session.add(new_doc)
-        db.session.commit()
+        if run_async:
+            if not new_doc:
+                new_doc = new_pdf_document(filename, pdf_bytes, content_hash)
+            job = UploadJob(pdf=new_doc, member_id=current_user_id)
+            db.session.add(job)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent upload of the same file won the insert
+                db.session.rollback()
+                statement.close()
+                return jsonify({"error": "This statement is already being uploaded"}), 409
 
-        pdf_id = new_doc.id
+            # The worker takes ownership of the opened statement
+            submit_upload_job(job.id, statement)
+            return jsonify({
+                "success": "Upload queued for analysis",
+                "job_id": job.id,
+                "status": job.status
+            }), 202
 
-        # Extract data
-        transactions_data = extract_transactions(pdf_bytes, password)
-        metadata = extract_metadata(pdf_bytes, password)
-        summary_table = extract_summary_table(pdf_bytes, password)
+        # Parse and compute before writing anything, so the database write
+        # lock is only held for the short insert transaction below
+        started_at = datetime.utcnow()
+        try:
+            result = analyze_statement(statement, receipts_only=stream)
+        finally:
+            statement.close()
 
-        # Generate and save summaries (persist + return dicts)
-        spending_money_summary = generate_and_spend_summary(transactions_data, pdf_id)
-        received_money_summary = generate_and_received_summary(transactions_data, pdf_id)
+        if not new_doc:
+            new_doc = new_pdf_document(filename, pdf_bytes, content_hash)
+        # A finished job marks the document as analyzed for later re-uploads
+        db.session.add(UploadJob(pdf=new_doc, member_id=current_user_id, status='done',
+                                 started_at=started_at, finished_at=datetime.utcnow()))
+        try:
+            db.session.flush()
+            save_analysis(new_doc.id, result)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent upload of the same file won the insert
+            db.session.rollback()
+            return jsonify({"error": "This statement is already being uploaded"}), 409
+        except Exception:
+            db.session.rollback()
+            raise
 
+        if stream:
+            return stream_analysis({
+                "success": "Uploaded and analyzed successfully",
+                "pdf_id": new_doc.id,
+                "filename": filename,
+                **result
+            })
 
         return jsonify({
             "success": "Uploaded and analyzed successfully",
+            "pdf_id": new_doc.id,
             "filename": filename,
-            "metadata": metadata,
-            "summary_table": summary_table,
-            "spending_money_summary": spending_money_summary,
-            "received_money_summary":  received_money_summary,
-            "transactions": transactions_data,
+            **result
         }), 200
 
     except Exception as e:
         print("ERROR during upload:", e)
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+def new_pdf_document(filename, pdf_bytes, content_hash):
+    pdf_doc = PdfDocument(
+        filename=filename,
+        storage_key=get_blob_store().put(pdf_bytes),
+        size=len(pdf_bytes),
+        content_hash=content_hash,
+        uploaded_at=datetime.utcnow()
+    )
+    db.session.add(pdf_doc)
+    return pdf_doc
+
+
+def analyze_statement(statement, receipts_only=False):
+    """Extract and summarize a statement without touching the database."""
+    transactions_data = extract_transactions(
+        statement, workers=current_app.config.get("EXTRACTION_WORKERS", 1)
+    )
+    metadata = extract_metadata(statement)
+    summary_table = extract_summary_table(statement)
+
+    spending_money_summary, received_money_summary = generate_summaries(transactions_data, receipts_only)
+
+    return {
+        "metadata": metadata,
+        "summary_table": summary_table,
+        "spending_money_summary": spending_money_summary,
+        "received_money_summary":  received_money_summary,
+        "transactions": transactions_data,
+    }
+
+
+def save_analysis(pdf_id, result):
+    """Write an analyze_statement() result for a document; the caller commits."""
+    # Keep every receipt queryable without re-parsing the PDF
+    save_statement_transactions(result["transactions"], pdf_id)
+    save_summaries(pdf_id, result["spending_money_summary"], result["received_money_summary"],
+                   result["metadata"])
+
+
+# Record type emitted for each list item of an analysis in NDJSON mode
+NDJSON_LIST_RECORDS = [
+    ("summary_table", "summary_row"),
+    ("spending_money_summary", "spending_summary"),
+    ("received_money_summary", "received_summary"),
+    ("transactions", "transaction"),
+]
+
+
+def stream_analysis(analysis):
+    """Stream an analysis as newline-delimited JSON records.
+
+    The first record carries the scalar fields (success, pdf_id, filename,
+    metadata); every summary row, category and transaction follows as its
+    own record so the body is never serialized in one piece.
+    """
+    list_keys = {key for key, _ in NDJSON_LIST_RECORDS}
+
+    def generate():
+        header = {key: value for key, value in analysis.items() if key not in list_keys}
+        yield json.dumps({"type": "upload", **header}) + "\n"
+
+        for key, record_type in NDJSON_LIST_RECORDS:
+            for item in analysis.get(key, []):
+                yield json.dumps({"type": record_type, "data": item}) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+def saved_analysis(pdf_doc):
+    spending_money_summary, received_money_summary = get_saved_summaries(pdf_doc.id)
+
+    return {
+        "success": "Statement already analyzed",
+        "duplicate": True,
+        "pdf_id": pdf_doc.id,
+        "filename": pdf_doc.filename,
+        "spending_money_summary": spending_money_summary,
+        "received_money_summary": received_money_summary
+    }
+
+
+def stored_analysis(pdf_doc):
+    """The saved analysis of a document: summaries, customer details and transactions."""
+    spending_money_summary, received_money_summary = get_saved_summaries(pdf_doc.id)
+    details = CustomerDetails.query.filter_by(pdf_id=pdf_doc.id).first()
+    transactions = StatementTransaction.query.filter_by(pdf_id=pdf_doc.id)\
+        .order_by(StatementTransaction.completed_at, StatementTransaction.id).all()
+
+    return {
+        "success": "Uploaded and analyzed successfully",
+        "pdf_id": pdf_doc.id,
+        "filename": pdf_doc.filename,
+        "metadata": {
+            "customer_name": details.customer_name,
+            "mobile_number": details.mobile_number,
+            "email_address": details.email_address,
+            "statement_period": details.statement_period,
+            "request_date": details.request_date,
+            "statement_duration_months": details.statement_duration_months
+        } if details else None,
+        "spending_money_summary": spending_money_summary,
+        "received_money_summary": received_money_summary,
+        "transactions": [serialize_statement_transaction(t) for t in transactions]
+    }
+
+
+def submit_upload_job(job_id, statement):
+    global _upload_executor
+
+    if _upload_executor is None:
+        _upload_executor = ThreadPoolExecutor(
+            max_workers=current_app.config.get("UPLOAD_JOB_WORKERS", 2),
+            thread_name_prefix="upload-job"
+        )
+    app = current_app._get_current_object()
+    _upload_executor.submit(_run_upload_job, app, job_id, statement)
+
+
+def _run_upload_job(app, job_id, statement):
+    with app.app_context():
+        # Claim the job; recovery may have handed it to another worker already
+        claimed = UploadJob.query.filter_by(id=job_id, status='queued')\
+            .update({'status': 'running', 'started_at': datetime.utcnow()})
+        db.session.commit()
+        if not claimed:
+            statement.close()
+            return
+
+        job = UploadJob.query.get(job_id)
+
+        try:
+            result = analyze_statement(statement)
+            save_analysis(job.pdf_id, result)
+            job.status = 'done'
+        except Exception as e:
+            print("ERROR during upload job:", e)
+            db.session.rollback()
+            job = UploadJob.query.get(job_id)
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            statement.close()
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def _is_stale(job, now):
+    timeout = current_app.config.get("UPLOAD_JOB_TIMEOUT", timedelta(minutes=10))
+    if job.status == 'running':
+        return (job.started_at or job.created_at) < now - timeout
+    return job.status == 'queued' and job.created_at < now - timeout
+
+
+def fail_stale_jobs(jobs):
+    """Mark queued/running jobs past UPLOAD_JOB_TIMEOUT as failed. Returns how many."""
+    now = datetime.utcnow()
+    stale = [job for job in jobs if _is_stale(job, now)]
+    for job in stale:
+        job.status = 'failed'
+        job.error = "Analysis was interrupted (server restart); upload the statement again"
+        job.finished_at = now
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+
+def recover_upload_jobs():
+    """Pick up jobs a restarted worker left behind. Returns (requeued, failed).
+
+    Stale 'queued' jobs are reopened from the blob store and submitted again
+    (the worker's claim keeps a job from running twice); statements that need
+    a password cannot be reopened and fail like stale 'running' jobs.
+    """
+    now = datetime.utcnow()
+    jobs = UploadJob.query.filter(UploadJob.status.in_(('queued', 'running'))).all()
+    requeue = []
+    for job in jobs:
+        if job.status != 'queued' or not _is_stale(job, now):
+            continue
+        try:
+            statement = open_stored_statement(job.pdf)
+        except Exception:
+            continue  # failed below
+        requeue.append((job.id, statement))
+
+    requeued_ids = {job_id for job_id, _ in requeue}
+    failed = fail_stale_jobs([job for job in jobs if job.id not in requeued_ids])
+
+    for job_id, statement in requeue:
+        submit_upload_job(job_id, statement)
+    return len(requeue), failed
+
+
+@upload_bp.before_app_request
+def _recover_upload_jobs_once():
+    global _jobs_recovered
+    if _jobs_recovered:
+        return
+    _jobs_recovered = True
+    try:
+        recover_upload_jobs()
+    except Exception as e:
+        db.session.rollback()
+        print("ERROR during upload job recovery:", e)
+
+
+def _get_own_job(job_id):
+    current_user_id = get_jwt_identity()
+    job = UploadJob.query.get(job_id)
+    if not job or job.member_id != current_user_id:
+        return None
+    return job
+
+
+# Poll an upload job
+@upload_bp.route('/upload/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+@analyst_required
+def get_upload_job(job_id):
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({"error": "Upload job not found"}), 404
+
+    return jsonify({
+        "job_id": job.id,
+        "pdf_id": job.pdf_id,
+        "filename": job.pdf.filename,
+        "status": job.status,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }), 200
+
+
+# Fetch the analysis produced by a finished upload job
+@upload_bp.route('/upload/jobs/<int:job_id>/result', methods=['GET'])
+@jwt_required()
+@analyst_required
+def get_upload_job_result(job_id):
+    job = _get_own_job(job_id)
+    if not job:
+        return jsonify({"error": "Upload job not found"}), 404
+
+    if job.status == 'failed':
+        return jsonify({"error": job.error, "status": job.status}), 500
+
+    if job.status != 'done':
+        return jsonify({"message": "Analysis still in progress", "status": job.status}), 202
+
+    # Built from the saved rows, so sync and async uploads answer alike
+    return jsonify(stored_analysis(job.pdf)), 200